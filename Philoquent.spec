@@ -23,7 +23,26 @@ a = Analysis(
     hiddenimports=[
         'whisper_flow',
         'whisper_flow.app',
+        'whisper_flow.engine',
+        'whisper_flow.loop',
+        'whisper_flow.streaming',
+        'whisper_flow.speculative',
+        'whisper_flow.scheduler',
+        'whisper_flow.residency',
+        'whisper_flow.modelstore',
+        'whisper_flow.metrics',
+        'whisper_flow.trace',
+        'whisper_flow.vad',
+        'whisper_flow.language',
+        'whisper_flow.features',
+        'whisper_flow.cadence',
+        'whisper_flow.calibration',
+        'whisper_flow.longform',
+        'whisper_flow.dispatch',
+        'whisper_flow.bench',
+        'whisper_flow.daemon',
         'whisper_flow.recorder',
+        'whisper_flow.resample',
         'whisper_flow.transcriber',
         'whisper_flow.inserter',
         'whisper_flow.overlay',
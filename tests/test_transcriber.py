@@ -0,0 +1,92 @@
+"""Batched final decoding with a fake model that enforces CTranslate2's prompt rule."""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from whisper_flow.transcriber import Transcriber
+
+SOT, SOT_PREV, NO_TIMESTAMPS = -1, -2, -3
+
+
+class FakeTokenizer:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def encode(self, text):
+        return [len(word) for word in text.split()]
+
+    def decode(self, ids):
+        return " ".join(f"w{i}" for i in ids)
+
+
+class FakeGenerator:
+    is_multilingual = False
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, features, prompts, **kwargs):
+        if len({prompt.index(SOT) for prompt in prompts}) > 1:
+            raise ValueError("requires the <|startoftranscript|> token to be at the same position in all batches")
+        self.calls.append(len(prompts))
+        # "Transcribes" each item as its prompt length, so results can be matched to inputs
+        return [SimpleNamespace(no_speech_prob=0.0, sequences_ids=[[len(prompt)]]) for prompt in prompts]
+
+
+class FakeWhisper:
+    max_length = 448
+    hf_tokenizer = None
+
+    def __init__(self):
+        self.model = FakeGenerator()
+
+    def feature_extractor(self, audio):
+        return np.zeros((80, len(audio) // 160 + 1), dtype="float32")
+
+    def get_prompt(self, tokenizer, previous_tokens, without_timestamps):
+        prefix = [SOT_PREV] + previous_tokens if previous_tokens else []
+        return prefix + [SOT, NO_TIMESTAMPS]
+
+    def encode(self, features):
+        return features
+
+
+@pytest.fixture
+def fake_tokenizer(monkeypatch):
+    import faster_whisper.tokenizer
+    import faster_whisper.transcribe
+
+    monkeypatch.setattr(faster_whisper.tokenizer, "Tokenizer", FakeTokenizer)
+    monkeypatch.setattr(faster_whisper.transcribe, "get_suppressed_tokens", lambda tokenizer, tokens: [])
+
+
+def test_generate_batch_mixes_prompt_lengths(fake_tokenizer):
+    transcriber = Transcriber(load=False)
+    model = FakeWhisper()
+    audios = [np.zeros(16000, dtype="float32")] * 4
+    prompts = ["hello there", "a much longer previous sentence of text", "", "hello again"]
+
+    texts = transcriber._generate_batch(model, audios, prompts, beam_size=1)
+
+    assert texts == ["w5", "w10", "w2", "w5"]  # prompt lengths, in input order
+    assert sorted(model.model.calls) == [1, 1, 2]
+
+
+def test_chunked_transcription_with_prompt(fake_tokenizer, monkeypatch):
+    import faster_whisper.vad
+
+    monkeypatch.setattr(faster_whisper.vad, "get_speech_timestamps",
+                        lambda audio, *args, **kwargs: [{"start": 0, "end": len(audio)}])
+    transcriber = Transcriber(load=False, final_batch_size=4)
+    model = FakeWhisper()
+    transcriber._wait_for = lambda role: model
+    audio = np.zeros(70 * 16000, dtype="float32")
+
+    text = transcriber.transcribe_chunked(audio, prompt="previous words")
+
+    chunks = len(transcriber.chunk_bounds(audio))
+    assert chunks > 4
+    assert text == " ".join(["w5"] + ["w2"] * (chunks - 1))  # the prompted chunk, then the rest
+    assert model.model.calls == [1, 4, chunks - 5]
@@ -1,4 +1,21 @@
-"""Allow running with: python -m whisper_flow"""
-from .app import main
+"""Allow running with: python -m whisper_flow [batch|bench|calibrate|daemon|models|recover|replay ...]"""
+import importlib
+import sys
 
-main()
+COMMANDS = {
+    "batch": ".batch",
+    "bench": ".bench",
+    "calibrate": ".calibration",
+    "daemon": ".daemon",
+    "models": ".modelstore",
+    "recover": ".longform",
+    "replay": ".trace",
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        command = importlib.import_module(COMMANDS[sys.argv[1]], __package__)
+        sys.exit(command.main(sys.argv[2:]))
+
+    from .app import main
+    main()
@@ -1,45 +1,87 @@
-"""Menu bar app with hold-to-record voice transcription."""
+"""Menu bar app with hold-to-record voice transcription.
+
+A thin macOS adapter over DictationEngine: pynput supplies the Shift-hold
+trigger, the menu bar title and AppKit overlay act as the display, and the
+clipboard inserter is the text sink.
+"""
 
 import argparse
-import threading
 import time
 
 import rumps
 from pynput import keyboard
 
 from .bundle_utils import is_frozen
+from .cadence import DUTY_CYCLE
+from .calibration import load_profile
+from .engine import DictationEngine, Display, Trigger, log
+from .longform import unfinished_sessions
+from .loop import EventLoop
+from .metrics import metrics
+from .modelstore import ModelStore
+from .trace import tracer
 from .recorder import AudioRecorder
-from .transcriber import Transcriber
+from .transcriber import BEAM_SIZE, DECODE_PROFILES, FINAL_PROFILE, Transcriber
 from .inserter import TextInserter
 from .overlay import Overlay
 
-MIN_AUDIO_SECONDS = 0.3
-STREAM_INITIAL_DELAY = 0.5  # seconds before first streaming attempt
-STREAM_INTERVAL = 0.7  # seconds between streaming transcription updates
 SAMPLE_RATE = 16000
+IDLE_UNLOAD_MINUTES = 10  # unload the final model after this long without a recording
+
 
+class ShiftTrigger(Trigger):
+    """Hold Shift to record; any other key during the hold means normal typing."""
 
-def log(msg):
-    print(f"[philoquent] {msg}", flush=True)
+    def __init__(self):
+        self._listener = None
+
+    @staticmethod
+    def _is_shift(key):
+        return key in (keyboard.Key.shift, keyboard.Key.shift_r, keyboard.Key.shift_l)
 
+    def start(self, on_press, on_release, on_interrupt):
+        def press(key):
+            (on_press if self._is_shift(key) else on_interrupt)()
 
-class WhisperFlowApp(rumps.App):
-    def __init__(self, model_size: str = "base", language: str = "en"):
-        super().__init__("🎤", quit_button=None)
+        def release(key):
+            if self._is_shift(key):
+                on_release()
 
-        self.recorder = AudioRecorder(sample_rate=SAMPLE_RATE)
-        self.transcriber = Transcriber(model_size=model_size, language=language)
-        self.inserter = TextInserter()
+        log("Starting keyboard listener...")
+        self._listener = keyboard.Listener(on_press=press, on_release=release)
+        self._listener.daemon = True
+        self._listener.start()
+
+    def stop(self):
+        if self._listener:
+            self._listener.stop()
+
+
+class WhisperFlowApp(rumps.App, Display):
+    def __init__(self, model_size: str = "base", language: str = "en",
+                 idle_unload: float | None = IDLE_UNLOAD_MINUTES * 60, memory_budget_mb: float | None = None,
+                 daemon: bool = False, stream_duty_cycle: float = DUTY_CYCLE,
+                 final_profile: str = FINAL_PROFILE, beam_size: int = BEAM_SIZE,
+                 latency_budget_ms: float | None = None, long_form: bool = False,
+                 live_insert: bool = False):
+        super().__init__("⏳", quit_button=None)
+        t_start = time.monotonic()
+
+        if daemon:
+            from .daemon import DaemonTranscriber
+            self.transcriber = DaemonTranscriber()
+        else:
+            calibration = load_profile()
+            self.transcriber = Transcriber(
+                model_size=model_size, language=language, load=False,
+                idle_unload=idle_unload, memory_budget_mb=memory_budget_mb,
+                calibration=calibration, final_profile=final_profile, beam_size=beam_size,
+                latency_budget_ms=latency_budget_ms, model_store=ModelStore(log=log),
+            )
         self.overlay = Overlay()
-        self._busy = False
-        self._shift_held = False
-        self._shift_cancelled = False
-        self._recording_active = False
-        self._shift_press_time = 0.0
-        self._hold_threshold = 0.3  # seconds before shift-hold triggers recording
 
         # Menu items
-        self._status = rumps.MenuItem("Ready")
+        self._status = rumps.MenuItem("Loading model...")
         self._hotkey = rumps.MenuItem("Hold Shift to record")
 
         self.menu = [
@@ -50,110 +92,78 @@ class WhisperFlowApp(rumps.App):
             rumps.MenuItem("Quit", callback=self._quit),
         ]
 
-        log("Starting keyboard listener...")
-        self._listener = keyboard.Listener(
-            on_press=self._on_press,
-            on_release=self._on_release,
+        # One event thread for hotkey handling, dictation state and paste timing
+        self.loop = EventLoop()
+        self.engine = DictationEngine(
+            self.transcriber,
+            AudioRecorder(sample_rate=SAMPLE_RATE, long_form=long_form),
+            display=self,
+            sink=TextInserter(self.loop),
+            trigger=ShiftTrigger(),
+            stream_duty_cycle=stream_duty_cycle,
+            incremental_insert=live_insert,
+            loop=self.loop,
         )
-        self._listener.daemon = True
-        self._listener.start()
-        log("Ready — hold Shift to record")
+        # Recording works right away; decodes queue on the scheduler until models are in
+        self.engine.start()
+        log(f"UI up in {time.monotonic() - t_start:.2f}s — loading models in background")
+        unfinished = unfinished_sessions()
+        if unfinished:
+            log(f"{len(unfinished)} unfinished long-form session(s) — "
+                f"recover with: python -m whisper_flow recover")
+        if not daemon:
+            uncalibrated = sorted({"tiny", model_size} - set(calibration or {}))
+            if uncalibrated:
+                log(f"No calibration for {', '.join(uncalibrated)} on this machine — for faster decodes run: "
+                    f"python -m whisper_flow calibrate --models {','.join(uncalibrated)} --audio <speech.wav>")
+
+    # ── Display ───────────────────────────────────────────────────────────
+
+    def show_loading(self):
+        self.title = "⏳"
+        self._status.title = "Loading model..."
+
+    def show_ready(self):
+        self.title = "🎤"
+        self._status.title = "Ready"
 
-    @staticmethod
-    def _is_shift(key):
-        return key in (keyboard.Key.shift, keyboard.Key.shift_r, keyboard.Key.shift_l)
+    def show_recording(self):
+        self.title = "🔴"
+        self._status.title = "Recording..."
+        self.overlay.show_recording()
 
-    def _on_press(self, key):
-        if self._is_shift(key):
-            if not self._shift_held and not self._busy:
-                self._shift_held = True
-                self._shift_cancelled = False
-                self._shift_press_time = time.monotonic()
-                threading.Timer(self._hold_threshold, self._check_shift_hold).start()
-        else:
-            # Any other key while shift is held = normal typing (e.g. Shift+A)
-            if self._shift_held and not self._recording_active:
-                self._shift_cancelled = True
-
-    def _check_shift_hold(self):
-        if self._shift_held and not self._shift_cancelled and not self._busy and not self._recording_active:
-            self._recording_active = True
-            log("Recording started")
-            self.recorder.start()
-            self.title = "🔴"
-            self._status.title = "Recording..."
-            self.overlay.show_recording()
-            threading.Thread(target=self._stream_loop, daemon=True).start()
-
-    def _on_release(self, key):
-        if self._is_shift(key) and self._shift_held:
-            self._shift_held = False
-            if not self._recording_active:
-                return  # was a quick tap or cancelled — do nothing
-            self._recording_active = False
-            audio = self.recorder.stop()
-            duration = len(audio) / SAMPLE_RATE if len(audio) > 0 else 0
-            log(f"Recording stopped — {duration:.1f}s")
-
-            if len(audio) > MIN_AUDIO_SECONDS * SAMPLE_RATE:
-                self._busy = True
-                self.title = "⏳"
-                self._status.title = "Transcribing..."
-                self.overlay.show_transcribing()
-                threading.Thread(target=self._final_transcribe, args=(audio,), daemon=True).start()
-            else:
-                log("Too short, discarding")
-                self.title = "🎤"
-                self._status.title = "Ready"
-                self.overlay.cancel()
-
-    def _stream_loop(self):
-        """Periodically transcribe accumulated audio for live text feedback."""
-        time.sleep(STREAM_INITIAL_DELAY)
-        while self._recording_active and self.recorder.is_recording:
-            audio = self.recorder.get_audio_snapshot()
-            if len(audio) > MIN_AUDIO_SECONDS * SAMPLE_RATE:
-                try:
-                    text = self.transcriber.transcribe_stream(audio)
-                    if text and self._recording_active:
-                        log(f"Stream: '{text[:60]}'")
-                        self.overlay.show_streaming(text)
-                except Exception:
-                    pass
-            time.sleep(STREAM_INTERVAL)
-
-    def _final_transcribe(self, audio):
-        """Final transcription after recording stops."""
-        try:
-            t0 = time.monotonic()
-            text = self.transcriber.transcribe(audio)
-            elapsed = time.monotonic() - t0
-            log(f"Final transcription ({elapsed:.1f}s): '{text}'")
-
-            if text:
-                self.inserter.insert(text)
-                self.title = "✅"
-                self._status.title = f"✓ {text[:50]}"
-                self.overlay.show_result(text)
-            else:
-                self.title = "🎤"
-                self._status.title = "No speech detected"
-                self.overlay.show_error("No speech detected")
-        except Exception as e:
-            log(f"Error: {e}")
-            self.title = "❌"
-            self._status.title = f"Error: {str(e)[:40]}"
-            self.overlay.show_error(str(e)[:60])
-        finally:
-            self._busy = False
-            threading.Timer(3.5, self._reset).start()
-
-    def _reset(self):
+    def show_streaming(self, text):
+        self.overlay.show_streaming(text)
+
+    def show_transcribing(self):
+        self.title = "⏳"
+        self._status.title = "Transcribing..."
+        self.overlay.show_transcribing()
+
+    def show_result(self, text):
+        self.title = "✅"
+        self._status.title = f"✓ {text[:50]}"
+        self.overlay.show_result(text)
+
+    def show_no_speech(self):
         self.title = "🎤"
-        self._status.title = "Ready"
+        self._status.title = "No speech detected"
+        self.overlay.show_error("No speech detected")
+
+    def show_error(self, msg):
+        self.title = "❌"
+        self._status.title = f"Error: {msg[:40]}"
+        self.overlay.show_error(msg)
+
+    def cancel(self):
+        self.overlay.cancel()
 
     def _quit(self, _):
-        self._listener.stop()
+        stats = self.overlay.dispatcher.stats()
+        log(f"Overlay: {stats['rendered']} redraws for {stats['submitted']} updates "
+            f"({stats['coalesced']} coalesced, {stats['dropped']} unchanged)")
+        self.engine.stop()
+        self.loop.stop()
         rumps.quit_application()
 
 
@@ -161,7 +171,14 @@ def main():
     if is_frozen():
         # Bundled .app — no CLI args, check permissions
         model_size = "base"
-        language = "en"
+        language = "auto"
+        idle_unload = IDLE_UNLOAD_MINUTES * 60
+        memory_budget = None
+        daemon = False
+        stream_cpu = DUTY_CYCLE
+        final_profile, beam_size, latency_budget = FINAL_PROFILE, BEAM_SIZE, None
+        long_form = False
+        live_insert = False
         from .first_run import check_accessibility
         from AppKit import NSApplication
         NSApplication.sharedApplication()
@@ -170,14 +187,57 @@ def main():
         parser = argparse.ArgumentParser(description="Philoquent — local voice-to-text")
         parser.add_argument("--model", default="base", choices=["tiny", "base", "small", "medium", "large-v3"],
                             help="Whisper model size (default: base)")
-        parser.add_argument("--language", default="en", help="Transcription language (default: en)")
+        parser.add_argument("--language", default="en",
+                            help="Transcription language, or 'auto' to detect it at the start of each "
+                                 "dictation (default: en)")
+        parser.add_argument("--idle-unload", type=float, default=IDLE_UNLOAD_MINUTES, metavar="MINUTES",
+                            help=f"Unload the final model after this many idle minutes, 0 to keep it "
+                                 f"loaded (default: {IDLE_UNLOAD_MINUTES})")
+        parser.add_argument("--memory-budget", type=float, default=None, metavar="MB",
+                            help="Memory budget for loaded models in MB (default: unlimited)")
+        parser.add_argument("--metrics", action="store_true",
+                            help="Record per-stage latency histograms to metrics.json/metrics.prom "
+                                 "in the data directory (or set PHILOQUENT_METRICS=1)")
+        parser.add_argument("--trace", action="store_true",
+                            help="Save each dictation (key events, audio, stage timings) to traces/ in the "
+                                 "data directory for 'python -m whisper_flow replay' (or set PHILOQUENT_TRACE=1)")
+        parser.add_argument("--daemon", action="store_true",
+                            help="Use a running 'python -m whisper_flow daemon' instead of loading models")
+        parser.add_argument("--stream-cpu", type=float, default=DUTY_CYCLE, metavar="FRACTION",
+                            help=f"Max share of time spent on live preview decodes; the preview "
+                                 f"interval adapts to stay under it (default: {DUTY_CYCLE})")
+        parser.add_argument("--final-profile", default=FINAL_PROFILE, choices=sorted(DECODE_PROFILES),
+                            help=f"Decoding profile for the final pass (default: {FINAL_PROFILE})")
+        parser.add_argument("--beam-size", type=int, default=BEAM_SIZE,
+                            help=f"Beam width for beam profiles (default: {BEAM_SIZE})")
+        parser.add_argument("--latency-budget", type=float, default=None, metavar="MS",
+                            help="Target release-to-text time; the last segment falls back to greedy "
+                                 "or the tiny model when the measured speed says it won't fit")
+        parser.add_argument("--long-form", action="store_true",
+                            help="Long dictation: keep a minute of audio in RAM, spill the rest to disk "
+                                 "and make sessions recoverable after a crash")
+        parser.add_argument("--live-insert", action="store_true",
+                            help="Paste each finished sentence at the cursor while you are still speaking")
         args = parser.parse_args()
+        if not 0 < args.stream_cpu <= 1:
+            parser.error("--stream-cpu must be more than 0 and at most 1")
+        if args.metrics:
+            metrics.enabled = True
+        if args.trace:
+            tracer.enable()
         model_size = args.model
         language = args.language
+        idle_unload = args.idle_unload * 60 or None
+        memory_budget = args.memory_budget
+        daemon = args.daemon
+        stream_cpu = args.stream_cpu
+        final_profile, beam_size, latency_budget = args.final_profile, args.beam_size, args.latency_budget
+        long_form = args.long_form
+        live_insert = args.live_insert
 
         print("Philoquent v0.1.0")
         print("─" * 40)
-        print(f"Model:    {model_size}")
+        print(f"Model:    {'daemon' if daemon else model_size}")
         print(f"Language: {language}")
         print(f"Hotkey:   Hold Shift to record")
         print()
@@ -186,5 +246,10 @@ def main():
         print("  • Microphone   (System Settings → Privacy → Microphone)")
         print()
 
-    app = WhisperFlowApp(model_size=model_size, language=language)
+    app = WhisperFlowApp(
+        model_size=model_size, language=language,
+        idle_unload=idle_unload, memory_budget_mb=memory_budget, daemon=daemon,
+        stream_duty_cycle=stream_cpu, final_profile=final_profile, beam_size=beam_size,
+        latency_budget_ms=latency_budget, long_form=long_form, live_insert=live_insert,
+    )
     app.run()
@@ -0,0 +1,145 @@
+"""Headless batch transcription over a process pool.
+
+    python -m whisper_flow batch recordings/ --model small --workers 4 -o out.jsonl
+
+Input is a directory (searched recursively for audio files) or a manifest:
+a .txt file with one path per line, or a .jsonl file with an "audio" key
+per line. Paths in a manifest are relative to the manifest's directory.
+Each worker process loads the final model once; results stream out as JSON
+lines in completion order.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".webm", ".aac", ".aiff"}
+SAMPLE_RATE = 16000
+
+_transcriber = None  # one per worker process
+
+
+def collect_inputs(path: str) -> list[str]:
+    """Audio files under a directory, or the entries of a manifest file."""
+    if os.path.isdir(path):
+        found = []
+        for root, _, files in os.walk(path):
+            found.extend(
+                os.path.join(root, name) for name in files
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS
+            )
+        return sorted(found)
+
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line)["audio"] if path.endswith(".jsonl") else line
+            entries.append(os.path.join(base, entry))
+    return entries
+
+
+def _init_worker(model_size: str, language: str, cpu_threads: int, chunk_seconds: float, final_batch_size: int):
+    global _transcriber
+    # Keep OpenMP/BLAS in the worker to its share of cores as well
+    os.environ["OMP_NUM_THREADS"] = str(cpu_threads)
+    from .transcriber import Transcriber
+
+    _transcriber = Transcriber(
+        model_size=model_size, language=language, load=False,
+        idle_unload=None, cpu_threads=cpu_threads,
+        chunk_seconds=chunk_seconds, final_batch_size=final_batch_size,
+    )
+    _transcriber.load(stream=False)
+
+
+def _transcribe_file(path: str) -> dict:
+    from faster_whisper import decode_audio
+
+    try:
+        audio = decode_audio(path, sampling_rate=SAMPLE_RATE)
+        t0 = time.monotonic()
+        text = _transcriber.transcribe(audio)
+        elapsed = time.monotonic() - t0
+    except Exception as e:
+        return {"path": path, "error": str(e)}
+    duration = len(audio) / SAMPLE_RATE
+    return {
+        "path": path,
+        "text": text,
+        "duration": round(duration, 3),
+        "elapsed": round(elapsed, 3),
+        "rtf": round(elapsed / duration, 4) if duration else None,
+        "worker": os.getpid(),
+    }
+
+
+def main(argv=None):
+    from .transcriber import BATCH_MAX_SECONDS, CHUNK_SECONDS, FINAL_BATCH_SIZE
+
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(prog="python -m whisper_flow batch",
+                                     description="Transcribe a directory or manifest of audio files")
+    parser.add_argument("input", help="Directory of audio files, or a .txt/.jsonl manifest")
+    parser.add_argument("--model", default="base", choices=["tiny", "base", "small", "medium", "large-v3"],
+                        help="Whisper model size (default: base)")
+    parser.add_argument("--language", default="en", help="Transcription language (default: en)")
+    parser.add_argument("--workers", type=int, default=max(1, cores // 4),
+                        help="Worker processes, each with its own model (default: cores / 4)")
+    parser.add_argument("--cpu-threads", type=int, default=0,
+                        help="CPU threads per worker (default: cores / workers)")
+    parser.add_argument("--chunk-seconds", type=float, default=CHUNK_SECONDS,
+                        help=f"Files longer than this are split at pauses into chunks up to this long "
+                             f"(default: {CHUNK_SECONDS:g})")
+    parser.add_argument("--final-batch-size", type=int, default=FINAL_BATCH_SIZE,
+                        help=f"Chunks decoded per batched pass, 1 to decode each file in one call "
+                             f"(default: {FINAL_BATCH_SIZE})")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    args = parser.parse_args(argv)
+    if not 0 < args.chunk_seconds <= BATCH_MAX_SECONDS:
+        parser.error(f"--chunk-seconds must be more than 0 and at most {BATCH_MAX_SECONDS:g}")
+
+    paths = collect_inputs(args.input)
+    if not paths:
+        print(f"No audio files found in {args.input}", file=sys.stderr)
+        return 1
+    workers = max(1, min(args.workers, len(paths)))
+    cpu_threads = args.cpu_threads or max(1, cores // workers)
+    print(f"Transcribing {len(paths)} files with {workers} workers × {cpu_threads} threads "
+          f"(model {args.model})", file=sys.stderr)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    t0 = time.monotonic()
+    total_audio = 0.0
+    failures = 0
+    try:
+        # spawn: CTranslate2 and OpenMP thread pools don't survive fork
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(args.model, args.language, cpu_threads, args.chunk_seconds, args.final_batch_size),
+        ) as pool:
+            futures = [pool.submit(_transcribe_file, p) for p in paths]
+            for future in as_completed(futures):
+                result = future.result()
+                failures += "error" in result
+                total_audio += result.get("duration", 0.0)
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    wall = time.monotonic() - t0
+    rtf = wall / total_audio if total_audio else 0.0
+    print(f"Done: {len(paths) - failures} ok, {failures} failed, {total_audio:.1f}s audio "
+          f"in {wall:.1f}s (RTF {rtf:.3f})", file=sys.stderr)
+    return 1 if failures else 0
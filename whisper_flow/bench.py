@@ -0,0 +1,442 @@
+"""Latency benchmark for the stream and final transcription paths.
+
+    python -m whisper_flow bench --models tiny,base --lengths 5,30,90 -o run.json
+    python -m whisper_flow bench --stub -o stub.json --compare baseline.json
+    python -m whisper_flow bench --frontend --lengths 30,120,300
+    python -m whisper_flow bench --resampler --rates 44100,48000
+    python -m whisper_flow bench --final --models small --batch-size 8 --workers 2
+
+Each clip is dictated through DictationEngine, the pipeline behind the menu
+bar app, with an array audio source that releases samples at --speed × real
+time and in-memory display and text sinks. Every model/compute type pair
+runs in its own process so peak RSS is per configuration. --stub swaps
+WhisperModel for a fixed-cost fake to time the pipeline alone. --frontend
+times only log-mel extraction per stream tick, full recompute against the
+incremental feature cache; it needs no model download. --resampler
+measures CPU per second of audio for device-rate conversion to 16 kHz and
+checks it against synthetic tones: passband tones must come out clean,
+a tone above 8 kHz must not alias in, and block-by-block output must match
+a one-shot conversion. --final times the final pass alone on clips of 10 s,
+60 s and 5 min by default: one sequential transcribe call against the clip
+split at pauses and decoded in batches, with the word error rate of the
+split transcript against the sequential one.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Real-time factor the stub charges per model size (rough CPU figures)
+STUB_RTF = {"tiny": 0.02, "base": 0.05, "small": 0.15, "medium": 0.4, "large-v3": 0.8}
+RESAMPLER_TONES = (300.0, 1000.0, 3000.0)  # Hz; passband test tones
+ALIAS_TONE = 10000.0  # Hz; above 16 kHz Nyquist, must be filtered out
+RESAMPLER_BLOCK = 512  # frames per callback, typical for CoreAudio
+FINAL_BENCH_BATCH_SIZE = 8  # chunks per batched pass that --final compares against one call
+MIN_TONE_SNR_DB = 60.0
+MAX_ALIAS_DB = -60.0
+METRICS = ("first_stream_s", "stream_p50_s", "stream_p90_s", "stream_p99_s",
+           "final_latency_s", "rtf", "peak_rss_mb")
+
+
+def synthetic_speech(seconds: float, seed: int = 0, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Speech-like bursts of modulated harmonics separated by short pauses."""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    audio = rng.normal(0, 0.002, total).astype("float32")
+    pos = int(0.3 * sample_rate)
+    while pos < total:
+        burst = int(rng.uniform(1.5, 4.0) * sample_rate)
+        t = np.arange(min(burst, total - pos)) / sample_rate
+        f0 = rng.uniform(100, 220)
+        voice = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(3, 6) * t)
+        audio[pos:pos + len(t)] += (0.08 * voice * envelope).astype("float32")
+        pos += burst + int(rng.uniform(0.3, 1.0) * sample_rate)
+    return audio
+
+
+class StubModel:
+    """Stands in for WhisperModel: sleeps for a fixed RTF, emits one word per loud half-second."""
+
+    def __init__(self, size, **kwargs):
+        self.rtf = STUB_RTF.get(size, 0.1)
+
+    def transcribe(self, audio, **kwargs):
+        duration = len(audio) / SAMPLE_RATE
+        time.sleep(duration * self.rtf)
+        step = SAMPLE_RATE // 2
+        words = []
+        for i in range(len(audio) // step):
+            chunk = np.asarray(audio[i * step:(i + 1) * step])
+            if np.sqrt(np.mean(chunk * chunk)) > 0.01:
+                words.append(SimpleNamespace(start=i * 0.5, end=(i + 1) * 0.5, word=f" w{i}"))
+        segment = SimpleNamespace(
+            start=0.0, end=duration, text="".join(w.word for w in words), words=words,
+        )
+        return iter([segment] if words else []), SimpleNamespace(duration=duration)
+
+
+def run_session(transcriber, audio: np.ndarray, speed: float = 1.0, live_insert: bool = False) -> dict:
+    """Dictate one clip through DictationEngine with headless I/O; return timings."""
+    from .engine import (
+        STREAM_INITIAL_DELAY, STREAM_INTERVAL, ArrayAudioSource, DictationEngine,
+        MemoryDisplay, MemoryTextSink,
+    )
+
+    source = ArrayAudioSource(audio, sample_rate=SAMPLE_RATE, speed=speed)
+    sink = MemoryTextSink()
+    engine = DictationEngine(
+        transcriber, source, MemoryDisplay(), sink,
+        hold_threshold=0, result_linger=0,
+        stream_initial_delay=STREAM_INITIAL_DELAY / speed,
+        stream_interval=STREAM_INTERVAL / speed,
+        incremental_insert=live_insert,
+    )
+    pressed = time.monotonic()
+    engine.press()
+    while not source.is_recording:  # press is handled on the engine's event loop
+        time.sleep(0.001)
+    while not source.finished:
+        time.sleep(0.01)
+    released = time.monotonic()
+    engine.release()
+    engine.wait_idle()
+    session = engine.last_session
+
+    # Whole-clip decode on the final model, i.e. the non-speculative path
+    d0 = time.monotonic()
+    transcriber.transcribe(audio)
+    full = time.monotonic() - d0
+
+    duration = len(audio) / SAMPLE_RATE
+    latencies = session["stream_latencies"]
+    pct = (lambda q: float(np.percentile(latencies, q))) if latencies else (lambda q: None)
+    return {
+        "duration_s": round(duration, 2),
+        "first_stream_s": session["first_stream"],
+        "stream_updates": len(latencies),
+        "stream_p50_s": pct(50),
+        "stream_p90_s": pct(90),
+        "stream_p99_s": pct(99),
+        "pre_decoded_s": round(session.get("pre_decoded", 0.0), 2),
+        "stream_skipped": session.get("stream_skipped", 0),
+        "stream_interval_s": session.get("stream_interval"),
+        "trimmed_s": round(session.get("trimmed", 0.0), 2),
+        "final_latency_s": session.get("final_latency"),
+        "first_insert_s": sink.times[0] - pressed if sink.times else None,
+        "inserted_before_release": sum(t < released for t in sink.times),
+        "full_final_s": full,
+        "rtf": full / duration if duration else None,
+        "scheduler": engine.scheduler.stats(),
+    }
+
+
+class _GrowingClip:
+    """Minimal audio source whose length is advanced by hand."""
+
+    def __init__(self, audio: np.ndarray):
+        self.audio = audio
+        self.num_samples = 0
+
+    def get_samples_since(self, offset: int) -> np.ndarray:
+        return self.audio[offset:self.num_samples]
+
+
+def frontend_bench(clips: list[tuple[str, np.ndarray]], n_mels: int = 80) -> list[dict]:
+    """Per-tick log-mel cost on the growing recording: FeatureExtractor vs MelFeatureCache."""
+    from faster_whisper.feature_extractor import FeatureExtractor
+
+    from .engine import STREAM_INTERVAL
+    from .features import MelFeatureCache
+
+    extractor = FeatureExtractor(feature_size=n_mels)
+    step = int(STREAM_INTERVAL * SAMPLE_RATE)
+    records = []
+    for name, audio in clips:
+        source = _GrowingClip(audio)
+        cache = MelFeatureCache(source, sample_rate=SAMPLE_RATE)
+        full, cached, error = [], [], 0.0
+        for end in range(step, len(audio) + 1, step):
+            source.num_samples = end
+            clip = audio[:end]
+            t0 = time.perf_counter()
+            reference = extractor(clip)
+            t1 = time.perf_counter()
+            cache.update()
+            features = cache.features(extractor.mel_filters, 0, clip, 160)
+            t2 = time.perf_counter()
+            full.append(t1 - t0)
+            cached.append(t2 - t1)
+            error = max(error, float(np.abs(features - reference).max()))
+        records.append({
+            "clip": name,
+            "duration_s": round(len(audio) / SAMPLE_RATE, 2),
+            "ticks": len(full),
+            "full_ms_per_tick": 1000 * float(np.mean(full)),
+            "cached_ms_per_tick": 1000 * float(np.mean(cached)),
+            "full_ms_last_tick": 1000 * full[-1],
+            "cached_ms_last_tick": 1000 * cached[-1],
+            "max_abs_error": error,
+        })
+    return records
+
+
+def _tone(freq: float, seconds: float, rate: int) -> np.ndarray:
+    return np.sin(2 * np.pi * freq * np.arange(int(seconds * rate)) / rate).astype("float32")
+
+
+def _resample(resampler, audio: np.ndarray, block: int) -> np.ndarray:
+    resampler.reset()
+    parts = [resampler.process(audio[i:i + block]) for i in range(0, len(audio), block)]
+    return np.concatenate(parts + [resampler.flush()])
+
+
+def resampler_bench(rates: list[int], seconds: float = 30.0, block: int = RESAMPLER_BLOCK) -> list[dict]:
+    """CPU cost and tone accuracy of StreamingResampler for each device rate."""
+    from .resample import StreamingResampler
+
+    records = []
+    for rate in rates:
+        resampler = StreamingResampler(rate, SAMPLE_RATE)
+        noise = np.random.default_rng(0).normal(0, 0.1, int(seconds * rate)).astype("float32")
+        t0 = time.process_time()
+        streamed = _resample(resampler, noise, block)
+        cpu = time.process_time() - t0
+        resampler.reset()
+        whole = np.concatenate((resampler.process(noise), resampler.flush()))
+
+        edge = SAMPLE_RATE // 10  # skip filter start-up and the flushed tail
+        snrs = []
+        for freq in RESAMPLER_TONES:
+            if freq > 0.35 * min(rate, SAMPLE_RATE):
+                continue  # outside the passband of a low-rate device
+            out = _resample(resampler, _tone(freq, 2.0, rate), block)[edge:-edge]
+            ref = _tone(freq, 2.0, SAMPLE_RATE)[edge:edge + len(out)]
+            snrs.append(10 * np.log10(np.mean(ref ** 2) / np.mean((out[:len(ref)] - ref) ** 2)))
+        alias = None
+        if rate > 2 * ALIAS_TONE:
+            out = _resample(resampler, _tone(ALIAS_TONE, 2.0, rate), block)[edge:-edge]
+            alias = 20 * np.log10(np.sqrt(np.mean(out ** 2)) / np.sqrt(0.5))
+        mismatch = float(np.abs(streamed - whole).max()) if len(streamed) == len(whole) else float("inf")
+        records.append({
+            "rate": rate,
+            "ratio": f"{resampler.up}/{resampler.down}",
+            "cpu_ms_per_audio_s": 1000 * cpu / seconds,
+            "min_tone_snr_db": float(min(snrs)),
+            "alias_db": None if alias is None else float(alias),
+            "stream_mismatch": mismatch,
+            "ok": min(snrs) >= MIN_TONE_SNR_DB and (alias is None or alias <= MAX_ALIAS_DB) and mismatch == 0.0,
+        })
+    return records
+
+
+def final_bench(model: str, compute_type: str, clips: list[tuple[str, np.ndarray]], chunk_seconds: float,
+                batch_size: int, workers: int) -> list[dict]:
+    """Final-pass time per clip, sequential against split and batched, in a fresh process."""
+    from .calibration import word_error_rate
+    from .transcriber import Transcriber
+
+    transcriber = Transcriber(model_size=model, load=False, idle_unload=None, compute_type=compute_type,
+                              num_workers=workers, chunk_seconds=chunk_seconds, final_batch_size=batch_size)
+    transcriber.load(stream=False)
+    if transcriber.load_error:
+        return [{"model": model, "compute_type": compute_type, "error": str(transcriber.load_error)}]
+
+    records = []
+    for name, audio in clips:
+        timed = {}
+        for mode, size in (("sequential", 1), ("chunked", batch_size)):
+            transcriber.final_batch_size = size
+            t0 = time.perf_counter()
+            text = transcriber.transcribe(audio)
+            timed[mode] = (time.perf_counter() - t0, text)
+        (sequential, reference), (chunked, text) = timed["sequential"], timed["chunked"]
+        chunks = len(transcriber.chunk_bounds(audio)) if len(audio) > chunk_seconds * SAMPLE_RATE else 1
+        records.append({
+            "model": model, "compute_type": compute_type, "clip": name,
+            "duration_s": round(len(audio) / SAMPLE_RATE, 1), "chunks": chunks,
+            "batch_size": batch_size, "workers": workers,
+            "sequential_s": sequential, "chunked_s": chunked, "speedup": sequential / chunked,
+            "wer_vs_sequential": word_error_rate(reference, text) if reference else None,
+        })
+    return records
+
+
+def _run_config(model: str, compute_type: str, stub: bool, clips: list[tuple[str, np.ndarray]],
+                speed: float, live_insert: bool = False) -> list[dict]:
+    """One model/compute type in a fresh process; returns a record per clip."""
+    from .residency import peak_rss_mb
+    from .transcriber import Transcriber
+
+    kwargs = {"model_factory": StubModel} if stub else {}
+    transcriber = Transcriber(model_size=model, load=False, idle_unload=None,
+                              compute_type=compute_type, **kwargs)
+    transcriber.load()
+    if transcriber.load_error:
+        return [{"model": model, "compute_type": compute_type, "error": str(transcriber.load_error)}]
+
+    records = []
+    for name, audio in clips:
+        record = {"model": model, "compute_type": compute_type, "stub": stub, "clip": name}
+        record.update(run_session(transcriber, audio, speed=speed, live_insert=live_insert))
+        record["load_s"] = transcriber.timings.get(f"{model}_load")
+        record["peak_rss_mb"] = round(peak_rss_mb(), 1)
+        records.append(record)
+    return records
+
+
+def _key(record: dict) -> tuple:
+    return record.get("model"), record.get("compute_type"), record.get("stub"), record.get("clip")
+
+
+def compare(results: list[dict], baseline: list[dict]):
+    """Print the relative change of each metric against a previous run."""
+    base = {_key(r): r for r in baseline}
+    for record in results:
+        prev = base.get(_key(record))
+        if not prev:
+            continue
+        changes = []
+        for metric in METRICS:
+            old, new = prev.get(metric), record.get(metric)
+            if old and new is not None:
+                changes.append(f"{metric} {(new - old) / old * 100:+.0f}%")
+        print(f"{record['model']}/{record['compute_type']} {record['clip']}: " + ", ".join(changes))
+
+
+def _fmt(value) -> str:
+    return "-" if value is None else f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+def main(argv=None):
+    from .transcriber import BATCH_MAX_SECONDS, CHUNK_SECONDS
+
+    parser = argparse.ArgumentParser(prog="python -m whisper_flow bench",
+                                     description="Benchmark stream and final transcription latency")
+    parser.add_argument("--models", default="tiny,base", help="Comma-separated model sizes (default: tiny,base)")
+    parser.add_argument("--compute-types", default="auto", help="Comma-separated compute types (default: auto)")
+    parser.add_argument("--lengths", default=None,
+                        help="Synthetic clip lengths in seconds (default: 5,30,90; 10,60,300 with --final)")
+    parser.add_argument("--audio", nargs="*", default=[], help="Fixture audio files to use instead of synthetic clips")
+    parser.add_argument("--stub", action="store_true", help="Use a fixed-cost stub model (pipeline timing only)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed relative to real time (default: 1)")
+    parser.add_argument("--live-insert", action="store_true",
+                        help="Insert segments while recording (reports time to first inserted text)")
+    parser.add_argument("--frontend", action="store_true",
+                        help="Time log-mel extraction per tick only (full recompute vs incremental cache)")
+    parser.add_argument("--resampler", action="store_true",
+                        help="Time and check device-rate to 16 kHz resampling on synthetic tones")
+    parser.add_argument("--rates", default="44100,48000",
+                        help="Device rates for --resampler (default: 44100,48000)")
+    parser.add_argument("--final", action="store_true",
+                        help="Time the final pass alone: sequential against split at pauses and batched")
+    parser.add_argument("--chunk-seconds", type=float, default=CHUNK_SECONDS,
+                        help=f"Longest chunk for --final (default: {CHUNK_SECONDS:g})")
+    parser.add_argument("--batch-size", type=int, default=FINAL_BENCH_BATCH_SIZE,
+                        help=f"Chunks per batched pass for --final (default: {FINAL_BENCH_BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="CTranslate2 workers for --final; batches run side by side on them (default: 1)")
+    parser.add_argument("-o", "--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Previous results file to compare against")
+    args = parser.parse_args(argv)
+    if not 0 < args.chunk_seconds <= BATCH_MAX_SECONDS:
+        parser.error(f"--chunk-seconds must be more than 0 and at most {BATCH_MAX_SECONDS:g}")
+    lengths = args.lengths or ("10,60,300" if args.final else "5,30,90")
+
+    if args.resampler:
+        results = resampler_bench([int(r) for r in args.rates.split(",")])
+        print("rate     ratio    cpu ms/audio s  min tone SNR  alias dB  stream mismatch  ok")
+        for r in results:
+            alias = "-" if r["alias_db"] is None else f"{r['alias_db']:.1f}"
+            print(f"{r['rate']:<8} {r['ratio']:<8} {r['cpu_ms_per_audio_s']:>14.2f}  {r['min_tone_snr_db']:>12.1f}"
+                  f"  {alias:>8}  {r['stream_mismatch']:>15.1e}  {'yes' if r['ok'] else 'NO'}")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"results": results}, f, indent=2)
+        return 0 if all(r["ok"] for r in results) else 1
+
+    if args.audio:
+        from faster_whisper import decode_audio
+        clips = [(os.path.basename(p), decode_audio(p, sampling_rate=SAMPLE_RATE)) for p in args.audio]
+    else:
+        clips = [(f"synthetic-{s}s", synthetic_speech(float(s), seed=i))
+                 for i, s in enumerate(lengths.split(","))]
+
+    if args.frontend:
+        results = frontend_bench(clips)
+        print("clip              ticks   full ms/tick  cached ms/tick  full last  cached last  max error")
+        for r in results:
+            print(f"{r['clip']:<17} {r['ticks']:>5}  {r['full_ms_per_tick']:>13.2f}  {r['cached_ms_per_tick']:>14.2f}"
+                  f"  {r['full_ms_last_tick']:>9.2f}  {r['cached_ms_last_tick']:>11.2f}  {r['max_abs_error']:.1e}")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"results": results}, f, indent=2)
+        return 0
+
+    ctx = multiprocessing.get_context("spawn")
+    if args.final:
+        results = []
+        for model in args.models.split(","):
+            for compute_type in args.compute_types.split(","):
+                print(f"Running final pass {model}/{compute_type}...", file=sys.stderr)
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    results.extend(pool.submit(
+                        final_bench, model, compute_type, clips, args.chunk_seconds, args.batch_size, args.workers,
+                    ).result())
+        print("model/compute     clip               chunks  sequential s  chunked s  speedup  WER vs seq")
+        for r in results:
+            label = f"{r['model']}/{r['compute_type']}"
+            if "error" in r:
+                print(f"{label:<17} error: {r['error']}")
+                continue
+            print(f"{label:<17} {r['clip']:<17} {r['chunks']:>7}  {r['sequential_s']:>12.2f}  {r['chunked_s']:>9.2f}"
+                  f"  {r['speedup']:>6.2f}x  {_fmt(r['wer_vs_sequential']):>10}")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"results": results}, f, indent=2)
+        return 0
+
+    results = []
+    for model in args.models.split(","):
+        for compute_type in args.compute_types.split(","):
+            print(f"Running {model}/{compute_type}{' (stub)' if args.stub else ''}...", file=sys.stderr)
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                results.extend(pool.submit(
+                    _run_config, model, compute_type, args.stub, clips, args.speed, args.live_insert,
+                ).result())
+
+    print("model/compute     clip              " + "  ".join(f"{m:>15}" for m in METRICS))
+    for r in results:
+        label = f"{r['model']}/{r['compute_type']}"
+        if "error" in r:
+            print(f"{label:<17} error: {r['error']}")
+            continue
+        print(f"{label:<17} {r['clip']:<17} " + "  ".join(f"{_fmt(r.get(m)):>15}" for m in METRICS))
+
+    if args.output:
+        meta = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "speed": args.speed,
+        }
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"Wrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)["results"])
+    return 0
@@ -0,0 +1,56 @@
+"""Stream cadence — how long to wait before queueing the next preview decode.
+
+The interval follows the measured decode time: on a slow machine it grows
+until stream decodes use at most `duty_cycle` of wall time, on a fast one it
+shrinks towards MIN_INTERVAL. It also waits until at least MIN_NEW_AUDIO
+seconds of audio have arrived since the last decode, since a shorter
+extension rarely changes the preview.
+"""
+
+import threading
+
+STREAM_INTERVAL = 0.7  # seconds between decodes until one has been timed
+DUTY_CYCLE = 0.5  # max fraction of wall time spent on stream decodes
+MIN_INTERVAL = 0.2
+MAX_INTERVAL = 3.0
+MIN_NEW_AUDIO = 0.3  # seconds of new audio worth a decode
+EMA_ALPHA = 0.3  # weight of the newest decode time in the moving average
+
+
+class CadenceController:
+    def __init__(self, base_interval: float = STREAM_INTERVAL, duty_cycle: float = DUTY_CYCLE,
+                 min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL):
+        if not 0 < duty_cycle <= 1:
+            raise ValueError(f"duty_cycle must be in (0, 1], got {duty_cycle:g}")
+        self.base_interval = base_interval
+        self.duty_cycle = duty_cycle
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.decode_ema: float | None = None  # kept across sessions
+        self.interval = base_interval  # last chosen interval, for monitoring
+        self._lock = threading.Lock()
+
+    def observe(self, decode_seconds: float):
+        """Record how long a stream decode took."""
+        with self._lock:
+            if self.decode_ema is None:
+                self.decode_ema = decode_seconds
+            else:
+                self.decode_ema += EMA_ALPHA * (decode_seconds - self.decode_ema)
+
+    def next_interval(self, new_audio: float) -> float:
+        """Seconds to wait, given *new_audio* seconds captured since the last decode."""
+        if self.decode_ema is None:
+            interval = self.base_interval
+        else:
+            interval = self.decode_ema / self.duty_cycle
+        interval = max(interval, MIN_NEW_AUDIO - new_audio, self.min_interval)
+        self.interval = min(interval, self.max_interval)
+        return self.interval
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "decode_ema": self.decode_ema,
+            "duty_cycle": self.duty_cycle,
+        }
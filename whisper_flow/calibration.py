@@ -0,0 +1,174 @@
+"""Per-machine calibration of thread count, workers and compute type.
+
+    python -m whisper_flow calibrate --models tiny,base --audio sample.wav
+
+Each model size is timed on a recording of real speech under every
+candidate cpu_threads / num_workers / compute_type combination. A
+candidate counts only if its transcript stays within MAX_WORD_ERROR of the
+float32 decode; the fastest of those (cheaper settings win near-ties) is
+saved to calibration.json in the data directory. Transcriber picks the
+saved settings up for that size on later launches, as long as the file was
+written on a machine with the same CPU layout.
+
+Calibration only runs on demand: the sweep loads every candidate in turn
+and keeps the CPU busy for minutes, which has no place behind a hotkey.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from .bundle_utils import get_data_dir, get_model_cache_dir
+
+MIN_REFERENCE_WORDS = 20  # the float32 transcript must be at least this long for WER to mean anything
+MAX_WORD_ERROR = 0.05  # word error rate allowed against the float32 transcript
+COMPUTE_TYPES = ("int8", "int8_float32", "float32")
+WORKER_COUNTS = (1, 2)
+REPEATS = 2  # decodes per candidate; the fastest counts
+MIN_GAIN = 0.03  # a costlier candidate (more threads/workers, wider type) must be this much faster
+
+
+def profile_path() -> str:
+    return os.path.join(get_data_dir(), "calibration.json")
+
+
+def machine_fingerprint() -> dict:
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def load_profile() -> dict | None:
+    """Saved settings per model size ({} if a run found none), or None if missing or from another machine."""
+    try:
+        with open(profile_path()) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if profile.get("fingerprint") != machine_fingerprint():
+        return None
+    return profile.get("models") or {}
+
+
+def save_profile(models: dict) -> str:
+    path = profile_path()
+    profile = {
+        "fingerprint": machine_fingerprint(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "models": models,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def thread_candidates(cpu_count: int | None = None) -> list[int]:
+    n = cpu_count or os.cpu_count() or 1
+    return sorted({c for c in (2, 4, n // 2, n) if 1 <= c <= n})
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        row = [i]
+        for j, h in enumerate(hyp, 1):
+            row.append(min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (r != h)))
+        prev = row
+    return prev[-1] / len(ref)
+
+
+def _time_candidate(size: str, audio, language: str | None, model_factory, **settings) -> tuple[float, str]:
+    model = model_factory(size, device="cpu", download_root=get_model_cache_dir(), **settings)
+    list(model.transcribe(audio[:16000], language=language, beam_size=1)[0])  # warm-up
+    best, text = float("inf"), ""
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        segments, _ = model.transcribe(audio, language=language, vad_filter=False)
+        text = " ".join(seg.text for seg in segments).strip()
+        best = min(best, time.perf_counter() - t0)
+    return best, text
+
+
+def calibrate(sizes, audio, language: str | None = "en", model_factory=None, log=print) -> dict:
+    """Time every candidate for each size on *audio*; return the fastest accurate settings per size.
+
+    *audio* must be real speech: a size whose float32 transcript has fewer
+    than MIN_REFERENCE_WORDS words is skipped, since the accuracy check
+    would pass any candidate.
+    """
+    if model_factory is None:
+        from faster_whisper import WhisperModel as model_factory
+    try:
+        import ctranslate2
+        supported = ctranslate2.get_supported_compute_types("cpu")
+        compute_types = [c for c in COMPUTE_TYPES if c in supported]
+    except ImportError:
+        compute_types = list(COMPUTE_TYPES)
+
+    duration = len(audio) / 16000
+    threads = thread_candidates()
+    results = {}
+    for size in sizes:
+        _, reference = _time_candidate(size, audio, language, model_factory,
+                                       compute_type="float32", cpu_threads=threads[-1], num_workers=1)
+        if len(reference.split()) < MIN_REFERENCE_WORDS:
+            log(f"{size}: only {len(reference.split())} words recognised; "
+                f"calibrate on a longer recording of speech")
+            continue
+        best = None
+        for compute_type in compute_types:
+            for cpu_threads in threads:
+                for num_workers in WORKER_COUNTS:
+                    settings = {"compute_type": compute_type, "cpu_threads": cpu_threads,
+                                "num_workers": num_workers}
+                    try:
+                        seconds, text = _time_candidate(size, audio, language, model_factory, **settings)
+                    except Exception as e:
+                        log(f"  {size} {settings}: failed ({e})")
+                        continue
+                    wer = word_error_rate(reference, text)
+                    log(f"  {size} {compute_type:<12} threads={cpu_threads:<2} workers={num_workers}: "
+                        f"RTF {seconds / duration:.3f}, WER {wer:.2f}")
+                    if wer <= MAX_WORD_ERROR and (best is None or seconds < best["seconds"] * (1 - MIN_GAIN)):
+                        best = dict(settings, seconds=seconds, rtf=seconds / duration, wer=wer)
+        if best:
+            results[size] = best
+            log(f"{size}: {best['compute_type']}, {best['cpu_threads']} threads, "
+                f"{best['num_workers']} workers (RTF {best['rtf']:.3f})")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m whisper_flow calibrate",
+                                     description="Find the fastest thread/compute settings for this machine")
+    parser.add_argument("--models", default="tiny,base", help="Comma-separated model sizes (default: tiny,base)")
+    parser.add_argument("--language", default="en",
+                        help="Transcription language, or 'auto' to let the model detect it (default: en)")
+    parser.add_argument("--audio", required=True,
+                        help=f"Recording of real speech to calibrate on, long enough for at least "
+                             f"{MIN_REFERENCE_WORDS} words")
+    args = parser.parse_args(argv)
+
+    from faster_whisper import decode_audio
+    audio = decode_audio(args.audio, sampling_rate=16000)
+
+    language = None if args.language == "auto" else args.language
+    results = calibrate(args.models.split(","), audio=audio, language=language,
+                        log=lambda msg: print(msg, file=sys.stderr, flush=True))
+    if not results:
+        print("No model calibrated; nothing saved.", file=sys.stderr)
+        return 1
+    models = load_profile() or {}
+    models.update(results)
+    print(f"Wrote {save_profile(models)}", file=sys.stderr)
+    return 0
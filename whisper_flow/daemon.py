@@ -0,0 +1,328 @@
+"""Local transcription daemon — one process holds the models for many clients.
+
+    python -m whisper_flow daemon --model small    # serve
+    philoquent --daemon                             # menu bar app as a client
+
+Clients talk over a Unix socket in the data directory. Each message is a
+4-byte big-endian header length, a JSON header and, for requests with a
+"samples" count, that many float32 samples. Ops:
+
+    transcribe  full clip on the final model            -> {"text": ...}
+    stream      streaming chunk on the tiny model       -> {"words": [[start, end, word], ...]}
+    status      model readiness and batching counters   -> {...}
+
+Full-clip requests that arrive within BATCH_WINDOW of each other, from any
+client, are decoded together with Transcriber.transcribe_batch(). A lone
+request goes through the same call, so a client gets the same decode
+(VAD, beam width, no timestamps) however busy the daemon is. Stream
+requests need word timings, which the batched decode doesn't produce, so
+they are served one at a time on their own worker.
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from .bundle_utils import get_data_dir
+
+BATCH_WINDOW = 0.015  # seconds to wait for more requests after the first
+MAX_BATCH = 8
+CONNECT_TIMEOUT = 2.0
+MAX_HEADER_BYTES = 1 << 16
+MAX_SAMPLES = 16000 * 600  # ten minutes of 16 kHz audio per request
+
+
+def socket_path() -> str:
+    return os.path.join(get_data_dir(), "daemon.sock")
+
+
+# ── Framing ───────────────────────────────────────────────────────────────
+
+def send_message(sock: socket.socket, header: dict, audio: np.ndarray | None = None):
+    if audio is not None:
+        audio = np.ascontiguousarray(audio, dtype="float32")
+        header = dict(header, samples=len(audio))
+    body = json.dumps(header).encode()
+    sock.sendall(struct.pack(">I", len(body)) + body)
+    if audio is not None:
+        sock.sendall(audio.tobytes())
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if k == 0:
+            raise ConnectionError("connection closed")
+        got += k
+    return bytes(buf)
+
+
+def recv_message(sock: socket.socket) -> tuple[dict, np.ndarray | None]:
+    """Read one message; a malformed or oversized one raises ConnectionError, as the stream is then lost."""
+    (length,) = struct.unpack(">I", _recv_exact(sock, 4))
+    if length > MAX_HEADER_BYTES:
+        raise ConnectionError(f"header of {length} bytes exceeds {MAX_HEADER_BYTES}")
+    try:
+        header = json.loads(_recv_exact(sock, length))
+    except ValueError as e:
+        raise ConnectionError(f"malformed header: {e}") from e
+    audio = None
+    if "samples" in header:
+        samples = header["samples"]
+        if not isinstance(samples, int) or not 0 <= samples <= MAX_SAMPLES:
+            raise ConnectionError(f"sample count {samples!r} outside 0..{MAX_SAMPLES}")
+        audio = np.frombuffer(_recv_exact(sock, 4 * samples), dtype="float32")
+    return header, audio
+
+
+# ── Server ────────────────────────────────────────────────────────────────
+
+class _Batcher:
+    """Queue of (audio, prompt) requests drained in batches by one worker."""
+
+    def __init__(self, decode, max_batch: int):
+        self._decode = decode  # list of (audio, prompt) -> list of results
+        self._max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue()
+        self.requests = 0
+        self.batches = 0
+        self.largest = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, audio: np.ndarray, prompt: str) -> Future:
+        future = Future()
+        self._queue.put((audio, prompt, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + BATCH_WINDOW
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.requests += len(batch)
+            self.batches += 1
+            self.largest = max(self.largest, len(batch))
+            try:
+                results = self._decode([(a, p) for a, p, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+class TranscriptionDaemon:
+    def __init__(self, transcriber, path: str | None = None):
+        self.transcriber = transcriber
+        self.path = path or socket_path()
+        self._final = _Batcher(
+            lambda reqs: transcriber.transcribe_batch([a for a, _ in reqs], [p for _, p in reqs]),
+            MAX_BATCH,
+        )
+        self._stream = _Batcher(
+            lambda reqs: [transcriber.transcribe_stream_words(a, prompt=p) for a, p in reqs],
+            1,
+        )
+        self.clients = 0
+        self._clients_lock = threading.Lock()  # one _serve_client thread per connection updates it
+
+    def status(self) -> dict:
+        return {
+            "ready": self.transcriber.ready,
+            "load_error": str(self.transcriber.load_error) if self.transcriber.load_error else None,
+            "model": self.transcriber.model_size,
+            "language": self.transcriber.language,
+            "clients": self.clients,
+            "final": {"requests": self._final.requests, "batches": self._final.batches,
+                      "largest_batch": self._final.largest},
+            "stream": {"requests": self._stream.requests},
+            "models": self.transcriber.models.stats(),
+        }
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # stale socket from a previous run
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o077)  # the socket is created owner-only, with no window before a chmod
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(umask)
+        server.listen()
+        threading.Thread(target=self.transcriber.load, daemon=True).start()
+        print(f"Listening on {self.path}", flush=True)
+        try:
+            while True:
+                conn, _ = server.accept()
+                threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+        finally:
+            server.close()
+            os.unlink(self.path)
+
+    def _serve_client(self, conn: socket.socket):
+        with self._clients_lock:
+            self.clients += 1
+        try:
+            while True:
+                header, audio = recv_message(conn)
+                send_message(conn, self._handle(header, audio))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self._clients_lock:
+                self.clients -= 1
+            conn.close()
+
+    def _handle(self, header: dict, audio: np.ndarray | None) -> dict:
+        op = header.get("op")
+        try:
+            if op == "status":
+                return self.status()
+            if op == "transcribe":
+                return {"text": self._final.submit(audio, header.get("prompt", "")).result()}
+            if op == "stream":
+                return {"words": self._stream.submit(audio, header.get("prompt", "")).result()}
+            return {"error": f"unknown op {op!r}"}
+        except Exception as e:
+            return {"error": str(e)}
+
+
+# ── Client ────────────────────────────────────────────────────────────────
+
+class _RemoteModels:
+    def __init__(self, client):
+        self._client = client
+
+    def stats(self) -> dict:
+        try:
+            return self._client._request({"op": "status"})["models"]
+        except (OSError, KeyError):
+            return {}
+
+
+class DaemonTranscriber:
+    """Drop-in for Transcriber that forwards every decode to a running daemon."""
+
+    def __init__(self, path: str | None = None):
+        self.path = path or socket_path()
+        self.model_size = "daemon"
+        self.language = None
+        self.stream_ready = threading.Event()
+        self.final_ready = threading.Event()
+        self.load_error: Exception | None = None
+        self.timings: dict[str, float] = {}
+        self.models = _RemoteModels(self)
+        self.features = None  # features are computed daemon-side
+        self._sock = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.stream_ready.is_set() and self.final_ready.is_set()
+
+    def load(self, stream: bool = True):
+        """Connect and wait until the daemon's models are loaded."""
+        t0 = time.monotonic()
+        try:
+            while True:
+                status = self._request({"op": "status"})
+                if status.get("load_error"):
+                    raise RuntimeError(status["load_error"])
+                if status.get("ready"):
+                    break
+                time.sleep(0.2)
+            self.model_size = status["model"]
+            self.language = status["language"]
+        except OSError as e:
+            self.load_error = RuntimeError(
+                f"daemon not reachable at {self.path} ({e}); start it with: python -m whisper_flow daemon"
+            )
+        except RuntimeError as e:
+            self.load_error = e
+        self.timings["daemon_connect"] = time.monotonic() - t0
+        self.stream_ready.set()
+        self.final_ready.set()
+
+    def prefetch_final(self):
+        pass  # the daemon manages residency for all clients
+
+    def transcribe(self, audio: np.ndarray, prompt: str = "", start: int | None = None,
+                   urgent: bool = False, queued: float = 0.0) -> str:
+        if len(audio) == 0:
+            return ""
+        if len(audio) > MAX_SAMPLES:
+            raise RuntimeError(f"clip longer than the daemon accepts ({MAX_SAMPLES / 16000 / 60:g} min)")
+        return self._request({"op": "transcribe", "prompt": prompt}, audio)["text"]
+
+    def transcribe_stream_words(self, audio: np.ndarray, prompt: str = "",
+                                start: int | None = None) -> list[tuple[float, float, str]]:
+        if len(audio) == 0:
+            return []
+        words = self._request({"op": "stream", "prompt": prompt}, audio)["words"]
+        return [tuple(w) for w in words]
+
+    def transcribe_stream(self, audio: np.ndarray) -> str:
+        return "".join(w for _, _, w in self.transcribe_stream_words(audio)).strip()
+
+    def _request(self, header: dict, audio: np.ndarray | None = None) -> dict:
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                        self._sock.settimeout(CONNECT_TIMEOUT)
+                        self._sock.connect(self.path)
+                        self._sock.settimeout(None)
+                    send_message(self._sock, header, audio)
+                    reply, _ = recv_message(self._sock)
+                    break
+                except (ConnectionError, OSError):
+                    if self._sock:
+                        self._sock.close()
+                    self._sock = None
+                    if attempt:
+                        raise
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m whisper_flow daemon",
+                                     description="Serve transcription to local clients over a Unix socket")
+    parser.add_argument("--model", default="base", choices=["tiny", "base", "small", "medium", "large-v3"],
+                        help="Whisper model size (default: base)")
+    parser.add_argument("--language", default="en",
+                        help="Transcription language, or 'auto' to detect it per request (default: en)")
+    parser.add_argument("--socket", default=None, help=f"Socket path (default: {socket_path()})")
+    args = parser.parse_args(argv)
+
+    from .modelstore import ModelStore
+    from .transcriber import Transcriber
+
+    transcriber = Transcriber(model_size=args.model, language=args.language, load=False,
+                              model_store=ModelStore())
+    try:
+        TranscriptionDaemon(transcriber, args.socket).serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
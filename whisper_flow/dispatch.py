@@ -0,0 +1,81 @@
+"""Coalescing, rate-limited dispatch of UI state to the main thread.
+
+Callers from any thread submit the overlay's next complete state; only the
+latest pending one is kept. At most one drain is queued on the main thread
+at a time, drains are spaced at least 1/fps apart, and a state equal to the
+one already on screen is not redrawn. A burst of streaming updates therefore
+costs one redraw instead of one main-thread hop each.
+
+The main-thread hop is an injected executor with `call(fn)` (any thread)
+and `call_later(delay, fn)` (main thread only). The overlay uses AppKit's
+run loop; loop.ManualLoop stands in for it in headless runs.
+"""
+
+import threading
+import time
+
+from .metrics import metrics
+
+OVERLAY_FPS = 30.0
+
+
+class UpdateDispatcher:
+    def __init__(self, render, executor, fps: float = OVERLAY_FPS, clock=time.monotonic):
+        self._render = render  # render(state, previous_state), called on the main thread
+        self._executor = executor
+        self._interval = 1.0 / fps if fps > 0 else 0.0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending = None
+        self._has_pending = False
+        self._scheduled = False
+        self._drawn = None
+        self._last_draw = float("-inf")
+        self.submitted = 0
+        self.rendered = 0
+        self.coalesced = 0  # superseded by a newer state before they were drawn
+        self.dropped = 0  # identical to what was already on screen
+
+    @property
+    def state(self):
+        """Last state drawn."""
+        return self._drawn
+
+    def submit(self, state):
+        with self._lock:
+            self.submitted += 1
+            if self._has_pending:
+                self.coalesced += 1
+                metrics.count("overlay_coalesced")
+            self._pending = state
+            self._has_pending = True
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._executor.call(self._drain)
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "rendered": self.rendered,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
+
+    def _drain(self):
+        wait = self._last_draw + self._interval - self._clock()
+        if wait > 0:
+            self._executor.call_later(wait, self._drain)
+            return
+        with self._lock:
+            state, self._pending = self._pending, None
+            self._has_pending = False
+            self._scheduled = False
+        if state == self._drawn:
+            self.dropped += 1
+            metrics.count("overlay_dropped")
+            return
+        previous, self._drawn = self._drawn, state
+        self._last_draw = self._clock()
+        self.rendered += 1
+        self._render(state, previous)
@@ -0,0 +1,628 @@
+"""Platform-neutral dictation engine — hold, record, stream, finalize, insert.
+
+Hotkey events, hold detection, stream ticks and decode completions are all
+handled on one EventLoop thread, which runs an explicit state machine:
+
+    idle ─press→ holding ─hold_threshold→ recording ─release→ finalizing ─done→ idle
+                 holding ─other key→ typing ─release→ idle
+
+Decodes run on the inference scheduler and post their results back to the
+loop, so no per-keystroke timers or per-session threads are created.
+
+The engine only talks to four small interfaces: an audio source, a trigger
+that reports hotkey presses, a display for progress and a text sink for the
+result. The macOS app plugs in the microphone recorder, a pynput listener,
+the AppKit overlay and the clipboard inserter; the array/file sources and
+in-memory sinks below let the same pipeline run headless on Linux.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from .cadence import DUTY_CYCLE, STREAM_INTERVAL, CadenceController
+from .features import MelFeatureCache
+from .loop import EventLoop
+from .metrics import metrics
+from .scheduler import InferenceScheduler
+from .speculative import SPEECH_PAD_SECONDS, SpeculativeFinalizer, clear_speech
+from .streaming import IncrementalStreamer
+from .trace import tracer
+from .vad import VoiceActivityTracker
+
+MIN_AUDIO_SECONDS = 0.3
+STREAM_INITIAL_DELAY = 0.5  # seconds before first streaming attempt
+HOLD_THRESHOLD = 0.3  # seconds before a held key triggers recording
+RESULT_LINGER = 3.5  # seconds the result stays up before returning to ready
+
+# Engine states
+IDLE = "idle"
+HOLDING = "holding"  # hotkey down, waiting out hold_threshold
+TYPING = "typing"  # another key was pressed during the hold; wait for release
+RECORDING = "recording"
+FINALIZING = "finalizing"
+
+
+def log(msg):
+    print(f"[philoquent] {msg}", flush=True)
+
+
+# ── Interfaces ────────────────────────────────────────────────────────────
+
+class AudioSource:
+    """Captures audio on start(); AudioRecorder is the microphone implementation."""
+
+    sample_rate = 16000
+    vad = None  # optional VoiceActivityTracker kept up to date as audio arrives
+
+    @property
+    def is_recording(self) -> bool:
+        raise NotImplementedError
+
+    def start(self):
+        raise NotImplementedError
+
+    def stop(self) -> np.ndarray:
+        raise NotImplementedError
+
+    def get_samples_since(self, offset: int) -> np.ndarray:
+        raise NotImplementedError
+
+
+class Trigger:
+    """Reports hotkey presses; other keys typed during a hold call on_interrupt."""
+
+    def start(self, on_press, on_release, on_interrupt):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class Display:
+    """Progress feedback. Every method is optional."""
+
+    def show_loading(self):
+        pass
+
+    def show_ready(self):
+        pass
+
+    def show_recording(self):
+        pass
+
+    def show_streaming(self, text: str):
+        pass
+
+    def show_transcribing(self):
+        pass
+
+    def show_result(self, text: str):
+        pass
+
+    def show_no_speech(self):
+        """The recording held nothing to transcribe; not an error."""
+        pass
+
+    def show_error(self, msg: str):
+        pass
+
+    def cancel(self):
+        pass
+
+
+class TextSink:
+    """Receives transcript text; TextInserter pastes it at the cursor.
+
+    insert() may return before the text is delivered; flush() waits for it,
+    when_flushed() calls back instead of waiting. With incremental insertion,
+    insert() gets one call per finalized segment.
+    """
+
+    def insert(self, text: str):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def when_flushed(self, callback):
+        """Call *callback* once everything inserted so far has been delivered."""
+        callback()
+
+
+# ── Headless implementations ──────────────────────────────────────────────
+
+class ArrayAudioSource(AudioSource):
+    """Serves a clip as if captured live, releasing samples at *speed* × real time."""
+
+    def __init__(self, audio: np.ndarray, sample_rate: int = 16000, speed: float = 1.0):
+        self.audio = np.asarray(audio, dtype="float32")
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self._t0 = 0.0
+        self._recording = False
+        self._vad = VoiceActivityTracker(sample_rate)
+        self._vad_lock = threading.Lock()
+
+    @property
+    def is_recording(self) -> bool:
+        return self._recording
+
+    @property
+    def vad(self) -> VoiceActivityTracker:
+        """Tracker fed up to the play position, as AudioRecorder's callback would."""
+        with self._vad_lock:
+            end = self.num_samples
+            if end > self._vad.samples:
+                self._vad.feed(self.audio[self._vad.samples:end])
+        return self._vad
+
+    @property
+    def num_samples(self) -> int:
+        if not self._recording:
+            return len(self.audio)
+        played = int((time.monotonic() - self._t0) * self.speed * self.sample_rate)
+        return min(len(self.audio), played)
+
+    @property
+    def finished(self) -> bool:
+        return self.num_samples >= len(self.audio)
+
+    def get_audio_snapshot(self) -> np.ndarray:
+        return self.audio[:self.num_samples]
+
+    def get_samples_since(self, offset: int) -> np.ndarray:
+        return self.audio[offset:self.num_samples]
+
+    def start(self):
+        with self._vad_lock:
+            self._vad.reset()
+        self._t0 = time.monotonic()
+        self._recording = True
+
+    def stop(self) -> np.ndarray:
+        audio = self.get_audio_snapshot()
+        self._recording = False
+        return audio
+
+
+class ScheduledAudioSource(ArrayAudioSource):
+    """Releases audio in blocks: block i ends at sample ends[i] and arrives at times[i] seconds."""
+
+    def __init__(self, audio: np.ndarray, times, ends, sample_rate: int = 16000, speed: float = 1.0):
+        super().__init__(audio, sample_rate, speed)
+        self.times = np.asarray(times, dtype="float64")
+        self.ends = np.asarray(ends, dtype="int64")
+
+    @property
+    def num_samples(self) -> int:
+        if not self._recording:
+            return len(self.audio)
+        elapsed = (time.monotonic() - self._t0) * self.speed
+        arrived = int(np.searchsorted(self.times, elapsed, side="right"))
+        return int(self.ends[arrived - 1]) if arrived else 0
+
+
+class FileAudioSource(ArrayAudioSource):
+    def __init__(self, path: str, sample_rate: int = 16000, speed: float = 1.0):
+        from faster_whisper import decode_audio
+
+        super().__init__(decode_audio(path, sampling_rate=sample_rate), sample_rate, speed)
+
+
+class ScriptedTrigger(Trigger):
+    """Replays (seconds, "press" | "release" | "interrupt") events on a thread."""
+
+    def __init__(self, script: list[tuple[float, str]]):
+        self.script = sorted(script)
+        self._stopped = threading.Event()
+
+    def start(self, on_press, on_release, on_interrupt):
+        handlers = {"press": on_press, "release": on_release, "interrupt": on_interrupt}
+
+        def run():
+            t0 = time.monotonic()
+            for at, event in self.script:
+                if self._stopped.wait(max(0.0, t0 + at - time.monotonic())):
+                    return
+                handlers[event]()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+
+class MemoryDisplay(Display):
+    """Records (monotonic time, method, argument) for every display update."""
+
+    def __init__(self):
+        self.events: list[tuple[float, str, str | None]] = []
+
+    def _record(self, name, arg=None):
+        self.events.append((time.monotonic(), name, arg))
+
+    def show_loading(self):
+        self._record("loading")
+
+    def show_ready(self):
+        self._record("ready")
+
+    def show_recording(self):
+        self._record("recording")
+
+    def show_streaming(self, text):
+        self._record("streaming", text)
+
+    def show_transcribing(self):
+        self._record("transcribing")
+
+    def show_result(self, text):
+        self._record("result", text)
+
+    def show_no_speech(self):
+        self._record("no_speech")
+
+    def show_error(self, msg):
+        self._record("error", msg)
+
+    def cancel(self):
+        self._record("cancel")
+
+
+class MemoryTextSink(TextSink):
+    def __init__(self):
+        self.texts: list[str] = []
+        self.times: list[float] = []  # monotonic time of each insert
+
+    def insert(self, text):
+        self.texts.append(text)
+        self.times.append(time.monotonic())
+
+    @property
+    def text(self) -> str:
+        """Everything inserted, as it would read at the cursor."""
+        return "".join(self.texts)
+
+
+# ── Engine ────────────────────────────────────────────────────────────────
+
+class DictationEngine:
+    def __init__(self, transcriber, source: AudioSource, display: Display | None = None,
+                 sink: TextSink | None = None, trigger: Trigger | None = None, *,
+                 hold_threshold: float = HOLD_THRESHOLD,
+                 stream_initial_delay: float = STREAM_INITIAL_DELAY,
+                 stream_interval: float = STREAM_INTERVAL,
+                 stream_duty_cycle: float = DUTY_CYCLE,
+                 result_linger: float = RESULT_LINGER,
+                 incremental_insert: bool = False,
+                 loop=None):
+        self.transcriber = transcriber
+        self.source = source
+        self.display = display or Display()
+        self.sink = sink or MemoryTextSink()
+        self.trigger = trigger
+        self.sample_rate = source.sample_rate
+        self.hold_threshold = hold_threshold
+        self.stream_initial_delay = stream_initial_delay
+        self.result_linger = result_linger
+        self.incremental_insert = incremental_insert  # paste segments while still recording
+        self._own_loop = loop is None
+        self.loop = loop or EventLoop()
+
+        self.scheduler = InferenceScheduler()
+        self.cadence = CadenceController(stream_interval, stream_duty_cycle)
+        self.streamer = IncrementalStreamer(transcriber, sample_rate=self.sample_rate)
+        self.finalizer = SpeculativeFinalizer(
+            transcriber, source, self.scheduler, sample_rate=self.sample_rate,
+        )
+        # Log-mel frames are computed as audio arrives and shared by every decode
+        self.features = None
+        if hasattr(source, "num_samples") and hasattr(transcriber, "features"):
+            self.features = MelFeatureCache(source, sample_rate=self.sample_rate)
+            transcriber.features = self.features
+        if incremental_insert:
+            # Segments finish on the inference thread; the paste and its bookkeeping belong to the loop
+            self.finalizer.on_segment = lambda text: self.loop.call(self._insert_segment, text)
+
+        # Touched only on the loop thread
+        self.state = IDLE
+        self._hold_timer = None
+        self._stream_timer = None
+        self._linger_timer = None
+        self._press_time = 0.0
+        self._streamed_to = 0  # tracker's speech_end at the last queued stream decode
+        self._queued_at = 0  # samples captured when the last stream decode was queued
+        self._trimmed_before = 0.0
+        self._inserted = 0  # segments inserted this session
+        self._session = None
+        self._idle = threading.Event()
+        self._idle.set()
+        self.last_session: dict = {}
+
+    # ── Lifecycle ─────────────────────────────────────────────────────────
+
+    def start(self, load: bool = True):
+        """Start listening; with *load*, models come up in the background."""
+        if self.trigger:
+            self.trigger.start(self.press, self.release, self.interrupt)
+        if load:
+            self.display.show_loading()
+            threading.Thread(target=self.load_models, daemon=True).start()
+
+    def stop(self):
+        if self.trigger:
+            self.trigger.stop()
+        if self._own_loop:
+            self.loop.stop()
+        if metrics.enabled:
+            log(f"Metrics written to {', '.join(metrics.dump())}")
+
+    def load_models(self):
+        self.transcriber.load()
+        timings = ", ".join(f"{k} {v:.2f}s" for k, v in self.transcriber.timings.items())
+        log(f"Startup timings: {timings}")
+        if self.transcriber.load_error:
+            self.display.show_error(str(self.transcriber.load_error)[:60])
+            return
+        self.loop.call(self._reset)
+        log("Ready — hold to record")
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """Block until no dictation is recording or finalizing."""
+        return self._idle.wait(timeout)
+
+    # ── Trigger events (any thread) ───────────────────────────────────────
+
+    def press(self):
+        self.loop.call(self._on_press)
+
+    def release(self):
+        self.loop.call(self._on_release)
+
+    def interrupt(self):
+        """Another key while held means normal typing (e.g. Shift+A), not dictation."""
+        self.loop.call(self._on_interrupt)
+
+    # ── State machine (loop thread) ───────────────────────────────────────
+
+    def _on_press(self):
+        if self.state != IDLE:
+            return  # key repeat, or still finalizing the last dictation
+        self.state = HOLDING
+        self._press_time = self.loop.clock()
+        self._hold_timer = self.loop.call_later(self.hold_threshold, self._on_hold)
+        if tracer.enabled:
+            tracer.begin(**self._trace_settings())
+            tracer.event("press")
+
+    def _on_interrupt(self):
+        if self.state == HOLDING:
+            self._hold_timer.cancel()
+            self.state = TYPING
+            tracer.event("interrupt")
+
+    def _on_hold(self):
+        if self.state != HOLDING:
+            return
+        self.state = RECORDING
+        self._idle.clear()
+        if self._linger_timer:
+            self._linger_timer.cancel()
+        metrics.observe("hold_detect", self.loop.clock() - self._press_time)
+        log("Recording started")
+        self._session = self.scheduler.begin_session()
+        self.last_session = {"stream_latencies": [], "first_stream": None, "stream_skipped": 0}
+        self._record_start = time.monotonic()
+        self.transcriber.prefetch_final()
+        if hasattr(self.transcriber, "begin_session"):
+            self.transcriber.begin_session()
+        self.streamer.reset()
+        self.finalizer.reset()
+        self._trimmed_before = self.finalizer.trimmed_seconds
+        self._inserted = 0
+        self._streamed_to = self._queued_at = 0
+        if self.features:
+            self.features.reset()
+        tracer.event("record_start")
+        with metrics.stage("recorder_start"):
+            self.source.start()
+        self.display.show_recording()
+        self._stream_timer = self.loop.call_later(self.stream_initial_delay, self._stream_tick, self._session)
+
+    def _on_release(self):
+        if self.state in (HOLDING, TYPING):
+            self._hold_timer.cancel()  # a quick tap or normal typing — do nothing
+            self.state = IDLE
+            tracer.discard()
+            return
+        if self.state != RECORDING:
+            return
+        tracer.event("release")
+        self._stream_timer.cancel()
+        self.scheduler.end_session(self._session)  # drop in-flight stream previews
+        audio = self.source.stop()
+        duration = len(audio) / self.sample_rate
+        self.last_session["duration"] = duration
+        log(f"Recording stopped — {duration:.1f}s")
+
+        if len(audio) > MIN_AUDIO_SECONDS * self.sample_rate:
+            self.state = FINALIZING
+            self.display.show_transcribing()
+            t0 = time.monotonic()
+            closed = self.finalizer.closed_samples / self.sample_rate
+            future = self.finalizer.finish(audio)
+            trimmed = self.finalizer.trimmed_seconds - self._trimmed_before
+            self.last_session["trimmed"] = trimmed
+            metrics.count("trimmed_seconds", trimmed)
+            future.add_done_callback(
+                lambda future: self.loop.call(self._on_final_done, future, t0, closed)
+            )
+        else:
+            log("Too short, discarding")
+            self.finalizer.cancel()
+            self._close_source_session()
+            self.state = IDLE
+            self._reset()
+            self.display.cancel()
+            self._idle.set()
+            self._write_trace()
+
+    # ── Pipeline ──────────────────────────────────────────────────────────
+
+    def _stream_tick(self, session):
+        """Queue a stream decode of the uncommitted tail for live feedback, then re-arm.
+
+        The wait between ticks comes from the cadence controller. With a voice
+        activity tracker that has heard speech, a tick is skipped when none
+        has arrived since the last decode was queued. Until it hears any (a
+        quiet mic may never cross its threshold), every tick decodes.
+        """
+        if self.state != RECORDING or session != self._session or not self.source.is_recording:
+            return
+        if self.features:
+            with metrics.stage("features"):
+                self.features.update()
+        self.finalizer.poll()
+        new_samples = len(self.source.get_samples_since(self._queued_at))
+        vad = getattr(self.source, "vad", None)
+        if vad is not None and vad.speech_start is not None and vad.speech_end <= self._streamed_to:
+            self.last_session["stream_skipped"] += 1
+            metrics.count("stream_skipped")
+        else:
+            if vad is not None:
+                self._streamed_to = vad.speech_end
+            self._queued_at += new_samples
+            new_samples = 0
+            submitted = time.monotonic()
+            self.scheduler.submit_stream(self._stream_update, session=session).add_done_callback(
+                lambda future: self.loop.call(self._on_stream_done, future, submitted)
+            )
+        interval = self.cadence.next_interval(new_samples / self.sample_rate)
+        self.last_session["stream_interval"] = interval
+        metrics.observe("stream_interval", interval)
+        self._stream_timer = self.loop.call_later(interval, self._stream_tick, session)
+
+    def _stream_update(self):
+        """Runs on the inference thread, so the tail is read as late as possible."""
+        if not self.transcriber.stream_ready.is_set():
+            return ""  # don't hold the queue for a preview
+        vad = getattr(self.source, "vad", None)
+        if clear_speech(vad):
+            # Nothing before the first speech frame can commit words
+            self.streamer.skip_to(vad.speech_start - int(SPEECH_PAD_SECONDS * self.sample_rate))
+        with metrics.stage("snapshot"):
+            tail = self.source.get_samples_since(self.streamer.offset)
+        if len(tail) > MIN_AUDIO_SECONDS * self.sample_rate:
+            t0 = time.perf_counter()
+            with metrics.stage("stream_decode"):
+                text = self.streamer.update(tail)
+            self.cadence.observe(time.perf_counter() - t0)
+            return text
+        return ""
+
+    def _on_stream_done(self, future, submitted):
+        if future.cancelled() or future.exception():
+            return
+        text = future.result()
+        if text and self.state == RECORDING:
+            now = time.monotonic()
+            self.last_session["stream_latencies"].append(now - submitted)
+            if self.last_session["first_stream"] is None:
+                self.last_session["first_stream"] = now - self._record_start
+            log(f"Stream: '{text[:60]}'")
+            tracer.event("stream", chars=len(text))
+            with metrics.stage("overlay_dispatch"):
+                self.display.show_streaming(text)
+
+    def _on_final_done(self, future, t0, closed):
+        """Final transcription after recording stops — only the open tail was left to decode."""
+        try:
+            text = future.result()
+            elapsed = time.monotonic() - t0
+            metrics.observe("final_decode", elapsed)
+            wait = self.scheduler.stats()["wait_last"]
+            self.last_session.update(final_latency=elapsed, pre_decoded=closed, queue_wait=wait, text=text)
+            log(f"Final transcription ({elapsed:.1f}s, {closed:.1f}s pre-decoded, "
+                f"{wait * 1000:.0f}ms queued, {self.last_session.get('trimmed', 0.0):.1f}s silence trimmed, "
+                f"{self.last_session['stream_skipped']} stream decodes skipped): '{text}'")
+            # stats() may run `ps` (macOS RSS) or ask the daemon over its socket; neither belongs on the loop
+            threading.Thread(target=lambda: log(f"Models: {self.transcriber.models.stats()}"),
+                             name="model-stats", daemon=True).start()
+            tracer.event("final", text=text)
+
+            if text:
+                if not self.incremental_insert:
+                    with metrics.stage("insert"):
+                        self.sink.insert(text)
+                # Finish once the paste is out, without blocking the loop on it
+                self.sink.when_flushed(lambda: self.loop.call(self._on_inserted, text, t0))
+                return
+            self.display.show_no_speech()
+            self._close_source_session()
+        except Exception as e:
+            log(f"Error: {e}")
+            self.last_session["error"] = str(e)
+            self.display.show_error(str(e)[:60])
+        self._finish_session()
+
+    def _on_inserted(self, text, t0):
+        metrics.observe("release_to_paste", time.monotonic() - t0)
+        self.display.show_result(text)
+        self._close_source_session()
+        self._finish_session()
+
+    def _finish_session(self):
+        self.state = IDLE
+        if self.result_linger > 0:
+            self._linger_timer = self.loop.call_later(self.result_linger, self._reset)
+        self._idle.set()
+        self._write_trace()
+        if metrics.enabled:
+            metrics.dump()
+
+    def _trace_settings(self) -> dict:
+        """Everything replay needs to rebuild this engine."""
+        return {
+            "sample_rate": self.sample_rate,
+            "hold_threshold": self.hold_threshold,
+            "stream_initial_delay": self.stream_initial_delay,
+            "stream_interval": self.cadence.base_interval,
+            "stream_duty_cycle": self.cadence.duty_cycle,
+            "incremental_insert": self.incremental_insert,
+            "model": getattr(self.transcriber, "model_size", None),
+            "language": getattr(self.transcriber, "language", None),
+            "final_profile": getattr(self.transcriber, "final_profile", None),
+        }
+
+    def _write_trace(self):
+        if tracer.active:
+            path = tracer.finish()
+            if path:
+                log(f"Writing trace to {path}")
+
+    def _insert_segment(self, text: str):
+        """Pastes one final segment, posted to the loop as each is decoded.
+
+        Segments are posted in decode order, and the tail's post precedes
+        the final result's, so the paste order matches the recording.
+        """
+        with metrics.stage("insert"):
+            self.sink.insert((" " if self._inserted else "") + text)
+        self._inserted += 1
+        self.last_session["inserted_segments"] = self._inserted
+
+    def _close_source_session(self):
+        """Tell a long-form source its recording is no longer needed for recovery."""
+        close = getattr(self.source, "close_session", None)
+        if close:
+            close()
+
+    def _reset(self):
+        if self.state in (RECORDING, FINALIZING):
+            return
+        if self.transcriber.ready:
+            self.display.show_ready()
+        else:
+            self.display.show_loading()
@@ -0,0 +1,206 @@
+"""Incremental log-mel features — each frame is computed once, as audio arrives.
+
+faster-whisper derives the log-mel spectrogram from raw samples on every
+transcribe() call, so every stream tick and the final pass redo the STFT
+over audio already seen. MelFeatureCache keeps un-normalized log-mel frames
+for the current recording, extended as samples come in, and
+CachedFeatureExtractor hands them to model.transcribe() in place of a fresh
+extraction. Frames whose window touches a clip edge depend on that clip's
+padding and are still computed per call, and Whisper's per-clip max
+normalization runs over the assembled span — both cost a handful of frames
+or one pass over the frame matrix, not an STFT over the whole clip.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+HOP = 160  # samples per frame at 16 kHz
+N_FFT = 400
+PAD = N_FFT // 2  # center padding on each side
+MAX_SECONDS = 600.0  # frames kept per buffer; older ones are recomputed on demand
+
+_WINDOW = np.hanning(N_FFT + 1)[:-1].astype("float32")
+
+
+def _strided(signal: np.ndarray, count: int) -> np.ndarray:
+    return np.lib.stride_tricks.as_strided(
+        signal, (count, N_FFT), (HOP * signal.strides[0], signal.strides[0]), writeable=False,
+    )
+
+
+def _log_mel(frames: np.ndarray, filters: np.ndarray) -> np.ndarray:
+    """Un-normalized log10 mel power, (n_mels, len(frames)), as FeatureExtractor computes it."""
+    spectrum = np.fft.rfft(frames * _WINDOW, axis=-1).astype("complex64")
+    power = np.abs(spectrum) ** 2
+    return np.log10(np.maximum(filters @ power.T, 1e-10))
+
+
+def _direct_frames(audio: np.ndarray, padding: int, j0: int, j1: int, filters: np.ndarray) -> np.ndarray:
+    """Frames [j0, j1) of *audio* zero-padded by *padding*, reflect-centered like torch.stft."""
+    if j1 <= j0:
+        return np.zeros((filters.shape[0], 0), dtype="float32")
+    n = len(audio)
+    ext = n + padding
+    idx = np.arange(j0 * HOP, (j1 - 1) * HOP + N_FFT) - PAD
+    idx = np.abs(idx)
+    over = idx >= ext
+    idx[over] = 2 * (ext - 1) - idx[over]
+    signal = np.where(idx < n, np.asarray(audio)[np.minimum(idx, n - 1)], 0.0).astype("float32")
+    return _log_mel(_strided(signal, j1 - j0), filters)
+
+
+def _normalize(log_spec: np.ndarray) -> np.ndarray:
+    np.maximum(log_spec, log_spec.max() - 8.0, out=log_spec)
+    log_spec += 4.0
+    log_spec /= 4.0
+    return log_spec
+
+
+class _MelBuffer:
+    """Log-mel frames for one mel filterbank, indexed by global frame number."""
+
+    def __init__(self, filters: np.ndarray, max_frames: int):
+        self.filters = filters
+        self.max_frames = max_frames
+        self.lock = threading.Lock()
+        self._data = np.empty((filters.shape[0], 1024), dtype="float32")
+        self.reset()
+
+    def reset(self):
+        # Frames 0 and 1 reach into the left reflection, so storage starts at 2
+        self.start = self.end = 2
+
+    def frames(self, g0: int, g1: int) -> np.ndarray:
+        return self._data[:, g0 - self.start:g1 - self.start]
+
+    def update(self, source) -> int:
+        """Compute frames whose window now lies fully inside the recording."""
+        last = (source.num_samples - PAD) // HOP + 1
+        count = last - self.end
+        if count <= 0:
+            return 0
+        first = self.end * HOP - PAD
+        samples = source.get_samples_since(first)[:(last - 1) * HOP + PAD - first]
+        if len(samples) < (count - 1) * HOP + N_FFT:
+            return 0
+        self._append(_log_mel(_strided(np.ascontiguousarray(samples), count), self.filters))
+        return count
+
+    def _append(self, new: np.ndarray):
+        count = new.shape[1]
+        used = self.end - self.start
+        capacity = self._data.shape[1]
+        if used + count > capacity and capacity < self.max_frames:
+            grown = np.empty((self._data.shape[0], min(self.max_frames, max(2 * capacity, used + count))),
+                             dtype="float32")
+            grown[:, :used] = self._data[:, :used]
+            self._data = grown
+            capacity = grown.shape[1]
+        if used + count > capacity:
+            # Drop the oldest frames, with slack so the shift is amortized
+            keep = max(0, capacity - count - self.max_frames // 4)
+            self._data[:, :keep] = self._data[:, used - keep:used]
+            used = keep
+            new = new[:, -capacity:]
+        self._data[:, used:used + new.shape[1]] = new
+        self.end += count
+        self.start = self.end - used - new.shape[1]
+
+
+class MelFeatureCache:
+    """Per-recording log-mel frames for each mel filterbank in use (80 or 128 bins)."""
+
+    def __init__(self, source, max_seconds: float = MAX_SECONDS, sample_rate: int = 16000):
+        self.source = source
+        self.max_frames = int(max_seconds * sample_rate / HOP)
+        self._buffers: dict[int, _MelBuffer] = {}
+        self._lock = threading.Lock()
+        self.cached_frames = 0
+        self.direct_frames = 0
+        self.update_seconds = 0.0
+
+    def reset(self):
+        for buf in self._buffers.values():
+            with buf.lock:
+                buf.reset()
+
+    def update(self):
+        """Extend every buffer with frames for newly captured audio."""
+        t0 = time.perf_counter()
+        for buf in list(self._buffers.values()):
+            with buf.lock:
+                buf.update(self.source)
+        self.update_seconds += time.perf_counter() - t0
+
+    def stats(self) -> dict:
+        return {
+            "cached_frames": self.cached_frames,
+            "direct_frames": self.direct_frames,
+            "update_seconds": round(self.update_seconds, 4),
+        }
+
+    def _buffer(self, filters: np.ndarray) -> _MelBuffer:
+        n_mels = filters.shape[0]
+        with self._lock:
+            if n_mels not in self._buffers:
+                self._buffers[n_mels] = _MelBuffer(filters, self.max_frames)
+            return self._buffers[n_mels]
+
+    def features(self, filters: np.ndarray, start: int, audio: np.ndarray, padding: int) -> np.ndarray:
+        """Normalized log-mel for *audio*, which is source samples from *start* onwards."""
+        n = len(audio)
+        total = (n + padding) // HOP
+        if start % HOP or n < 2 * N_FFT:
+            self.direct_frames += total
+            return _normalize(_direct_frames(audio, padding, 0, total, filters))
+
+        buf = self._buffer(filters)
+        g0 = start // HOP
+        lo = 2
+        hi = max(lo, min(total, (n - PAD) // HOP + 1))  # frames not touching either edge
+        out = np.empty((filters.shape[0], total), dtype="float32")
+        with buf.lock:
+            buf.update(self.source)
+            a = min(max(g0 + lo, buf.start), g0 + hi)
+            b = max(min(g0 + hi, buf.end), a)
+            out[:, a - g0:b - g0] = buf.frames(a, b)
+        out[:, :a - g0] = _direct_frames(audio, padding, 0, a - g0, filters)
+        out[:, b - g0:] = _direct_frames(audio, padding, b - g0, total, filters)
+        self.cached_frames += b - a
+        self.direct_frames += total - (b - a)
+        return _normalize(out)
+
+
+class CachedFeatureExtractor:
+    """Stands in for a model's FeatureExtractor and serves cached frames on request.
+
+    Inside `precomputed(audio, cache, start)`, a call with that exact array
+    is answered from *cache*; any other call goes to the wrapped extractor.
+    """
+
+    def __init__(self, inner):
+        self._inner = inner
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    @contextmanager
+    def precomputed(self, audio: np.ndarray, cache: MelFeatureCache, start: int):
+        self._local.job = (audio, cache, start)
+        try:
+            yield
+        finally:
+            self._local.job = None
+
+    def __call__(self, waveform, padding=160, chunk_length=None, **kwargs):
+        job = getattr(self._local, "job", None)
+        if job is None or waveform is not job[0] or chunk_length is not None:
+            return self._inner(waveform, padding=padding, chunk_length=chunk_length, **kwargs)
+        # faster-whisper < 1.1 pads a whole 30 s window (padding=True)
+        pad = self._inner.n_samples if padding is True else int(padding or 0)
+        audio, cache, start = job
+        return cache.features(self._inner.mel_filters, start, audio, pad)
@@ -1,39 +1,130 @@
 """Insert transcribed text at the current cursor position.
 
-Uses CGEventPost to simulate Cmd+V — bypasses osascript/System Events
-which fails silently on macOS Sequoia due to automation restrictions.
+Text is put on the general pasteboard in-process with NSPasteboard and
+pasted with a simulated Cmd+V via CGEventPost — which bypasses
+osascript/System Events that fail silently on macOS Sequoia. All pasteboard
+work runs as timed steps on an EventLoop (the engine's, when shared): inserts
+arriving within BATCH_WINDOW of each other go out as a single paste, and the
+user's clipboard is put back once no paste has happened for RESTORE_DELAY.
 """
 
-import subprocess
 import threading
-import time
 
+import objc
 import Quartz
+from AppKit import NSPasteboard, NSPasteboardTypeString
+
+from .loop import EventLoop
 
 V_KEYCODE = 9  # macOS virtual keycode for 'v'
+SYNC_DELAY = 0.05  # let the pasteboard settle before pasting
+BATCH_WINDOW = 0.05  # inserts this close together are pasted at once
+RESTORE_DELAY = 0.5  # idle time before the user's clipboard is restored
 
 
 class TextInserter:
+    def __init__(self, loop=None):
+        self.loop = loop or EventLoop("inserter")
+        self._lock = threading.Lock()
+        self._pending = 0  # inserted but not yet pasted
+        self._idle = threading.Event()
+        self._idle.set()
+        self._waiters = []  # when_flushed callbacks
+        # Touched only on the loop thread
+        self._parts: list[str] = []
+        self._batch = None  # timer for the next pasteboard write
+        self._pasting = False  # our text is on the pasteboard, Cmd+V not sent yet
+        self._restore_timer = None
+        self._saved: str | None = None  # user's clipboard while ours is on the pasteboard
+        self._change = None  # pasteboard changeCount right after our last write
+        self.pastes = 0
+
     def insert(self, text: str):
+        """Queue *text* for pasting; returns immediately."""
         if not text:
             return
+        with self._lock:
+            self._pending += 1
+            self._idle.clear()
+        self.loop.call(self._enqueue, text)
+
+    def flush(self, timeout: float | None = 2.0) -> bool:
+        """Block until every queued insert has been pasted. Not from the loop thread."""
+        return self._idle.wait(timeout)
+
+    def when_flushed(self, callback):
+        """Call *callback* (on the loop thread, or right away) once every queued insert is pasted."""
+        with self._lock:
+            if self._pending:
+                self._waiters.append(callback)
+                return
+        callback()
 
-        # Save current clipboard
-        old = subprocess.run(["/usr/bin/pbpaste"], capture_output=True, text=True).stdout
+    # ── Loop steps ────────────────────────────────────────────────────────
 
-        # Copy transcribed text to clipboard
-        subprocess.run(["/usr/bin/pbcopy"], input=text, text=True)
-        time.sleep(0.05)  # let pasteboard sync
+    def _enqueue(self, text: str):
+        self._parts.append(text)
+        if self._batch is None and not self._pasting:
+            self._batch = self.loop.call_later(BATCH_WINDOW, self._write)
 
-        # Simulate Cmd+V via CGEvent (reliable on macOS Sequoia)
-        self._paste()
+    def _write(self):
+        self._batch = None
+        parts, self._parts = self._parts, []
+        if self._restore_timer:
+            self._restore_timer.cancel()
+            self._restore_timer = None
+        try:
+            self._set_pasteboard("".join(parts))
+        except Exception as e:
+            print(f"[philoquent] Paste failed: {e}", flush=True)
+            self._done(len(parts))
+            return
+        self._pasting = True
+        self.loop.call_later(SYNC_DELAY, self._send_paste, len(parts))
+
+    def _send_paste(self, count: int):
+        try:
+            self._paste()
+            self.pastes += 1
+        except Exception as e:
+            print(f"[philoquent] Paste failed: {e}", flush=True)
+        self._pasting = False
+        self._done(count)
+        if self._parts:
+            self._batch = self.loop.call(self._write)  # arrived while this paste was in flight
+        else:
+            self._restore_timer = self.loop.call_later(RESTORE_DELAY, self._restore)
 
-        # Restore original clipboard after paste completes
-        def _restore():
-            time.sleep(0.5)
-            subprocess.run(["/usr/bin/pbcopy"], input=old, text=True)
+    def _done(self, count: int):
+        with self._lock:
+            self._pending -= count
+            if self._pending:
+                return
+            self._idle.set()
+            waiters, self._waiters = self._waiters, []
+        for callback in waiters:
+            callback()
 
-        threading.Thread(target=_restore, daemon=True).start()
+    def _set_pasteboard(self, text: str):
+        with objc.autorelease_pool():
+            pasteboard = NSPasteboard.generalPasteboard()
+            if self._saved is None:
+                self._saved = pasteboard.stringForType_(NSPasteboardTypeString) or ""
+            pasteboard.clearContents()
+            pasteboard.setString_forType_(text, NSPasteboardTypeString)
+            self._change = pasteboard.changeCount()
+
+    def _restore(self):
+        self._restore_timer = None
+        if self._saved is None:
+            return
+        with objc.autorelease_pool():
+            pasteboard = NSPasteboard.generalPasteboard()
+            # Leave it alone if the user copied something in the meantime
+            if pasteboard.changeCount() == self._change:
+                pasteboard.clearContents()
+                pasteboard.setString_forType_(self._saved, NSPasteboardTypeString)
+        self._saved = None
 
     @staticmethod
     def _paste():
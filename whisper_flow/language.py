@@ -0,0 +1,109 @@
+"""Per-dictation language detection for language="auto".
+
+The language is detected once per dictation, from about the first second
+of speech, with the resident tiny model. Every later stream and final
+decode of that dictation is then given the result, instead of each decode
+detecting it again on its own audio.
+
+A prior of the user's last RECENT_SESSIONS dictations, kept in
+languages.json in the data directory, only decides how soon detection may
+stop. When Whisper's top language is also the one the prior favours and
+the two together are confident, the first attempt settles the session.
+Otherwise detection runs once more on DETECT_MAX_SECONDS of speech and
+takes Whisper's own top language, so the prior can never outvote the
+audio (and then reinforce its own mistake). Until a language is settled,
+stream decodes use the language the prior finds most likely, if any.
+"""
+
+import json
+import os
+from collections import Counter
+
+from .bundle_utils import get_data_dir
+
+DETECT_SECONDS = 1.0  # speech needed before the first detection attempt
+DETECT_MAX_SECONDS = 3.0  # second and last attempt when the first is unsure
+LANGUAGE_CONFIDENCE = 0.8  # prior-weighed probability that settles a session on the first attempt
+RECENT_SESSIONS = 20  # dictations remembered in the prior
+PRIOR_WEIGHT = 4.0  # a language used in every recent dictation counts 1 + this times as much
+
+
+def prior_path() -> str:
+    return os.path.join(get_data_dir(), "languages.json")
+
+
+class LanguagePrior:
+    """Languages of the most recent dictations, oldest first."""
+
+    def __init__(self, path: str | None = None):
+        self.path = path or prior_path()
+        try:
+            with open(self.path) as f:
+                self.recent = [str(lang) for lang in json.load(f).get("recent", [])][-RECENT_SESSIONS:]
+        except (OSError, ValueError, AttributeError):
+            self.recent = []
+
+    def likely(self) -> str | None:
+        """Most frequent recent language; the latest one breaks ties."""
+        if not self.recent:
+            return None
+        counts = Counter(self.recent)
+        return max(reversed(self.recent), key=counts.__getitem__)
+
+    def weigh(self, probabilities: list[tuple[str, float]]) -> list[tuple[str, float]]:
+        """Detected (language, probability) pairs reweighed by recent use, best first."""
+        counts = Counter(self.recent)
+        n = len(self.recent) or 1
+        weighed = [(lang, p * (1 + PRIOR_WEIGHT * counts[lang] / n)) for lang, p in probabilities]
+        total = sum(p for _, p in weighed) or 1.0
+        return sorted(((lang, p / total) for lang, p in weighed), key=lambda x: -x[1])
+
+    def record(self, language: str):
+        self.recent = (self.recent + [language])[-RECENT_SESSIONS:]
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"recent": self.recent}, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # the prior is a hint; losing an update is harmless
+
+
+class SessionLanguage:
+    """Detection state for one dictation."""
+
+    def __init__(self, prior: LanguagePrior):
+        self.prior = prior
+        self.language: str | None = None
+        self.probability = 0.0
+        self._next_attempt = DETECT_SECONDS
+
+    @property
+    def guess(self) -> str | None:
+        """Language to decode with right now: the detected one, else the prior's."""
+        return self.language or self.prior.likely()
+
+    def wants(self, seconds: float, final: bool = False) -> bool:
+        """Whether *seconds* of audio are worth a detection attempt."""
+        return self.language is None and (final or seconds >= self._next_attempt)
+
+    def observe(self, probabilities: list[tuple[str, float]], seconds: float, final: bool = False) -> str | None:
+        """Feed one detection result; returns the language once it is settled.
+
+        The prior-weighed score only lets an attempt settle early, and only on
+        the language Whisper ranks first anyway; the last attempt takes
+        Whisper's top language as is.
+        """
+        language, probability = max(probabilities, key=lambda item: item[1])
+        favoured, weighed = self.prior.weigh(probabilities)[0]
+        if favoured == language and weighed >= LANGUAGE_CONFIDENCE:
+            self.settle(language, weighed)
+        elif final or seconds >= DETECT_MAX_SECONDS:
+            self.settle(language, probability)
+        else:
+            self._next_attempt = DETECT_MAX_SECONDS
+        return self.language
+
+    def settle(self, language: str, probability: float = 1.0):
+        self.language, self.probability = language, probability
+        self.prior.record(language)
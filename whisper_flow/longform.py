@@ -0,0 +1,237 @@
+"""Long-form recording — a sliding window in RAM, everything else on disk.
+
+    philoquent --long-form                    # record meetings of any length
+    python -m whisper_flow recover            # transcript of a session that died
+
+With long-form on, AudioRecorder writes into a SpillBuffer instead of one
+growing array. The last WINDOW_SECONDS stay in memory for the stream and
+segment decoders; a background thread copies every sample into a
+memory-mapped file in the session directory once a second, so older audio
+costs disk, not RAM. Segments finalized during recording are journaled next
+to the audio, which is enough to rebuild the transcript after a crash:
+journaled text first, then a decode of whatever audio came after it.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .bundle_utils import get_data_dir
+
+WINDOW_SECONDS = 60  # audio kept in RAM behind the write position
+SPILL_INTERVAL = 1.0  # seconds between copies to the spill file
+GROW_SECONDS = 600  # spill file is extended in steps of this much audio
+
+
+def sessions_dir() -> str:
+    path = os.path.join(get_data_dir(), "sessions")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def new_session_dir() -> str:
+    return os.path.join(sessions_dir(), time.strftime("%Y%m%d-%H%M%S"))
+
+
+def unfinished_sessions() -> list[str]:
+    """Session directories left behind by a crash or a failed final decode."""
+    root = sessions_dir()
+    return sorted(
+        os.path.join(root, name) for name in os.listdir(root)
+        if os.path.exists(os.path.join(root, name, "session.json"))
+    )
+
+
+def _write_json(path: str, data: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class SessionJournal:
+    """Append-only record of finalized segments: one JSON line per segment."""
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, "transcript.jsonl")
+
+    def append(self, start: int, end: int, text: str):
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"start": start, "end": end, "text": text}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def entries(self) -> list[dict]:
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break  # torn last line from a crash
+        return entries
+
+
+class SpillBuffer:
+    """Drop-in for recorder._SampleBuffer that keeps a bounded window in RAM.
+
+    Same single-writer, lock-free contract: the callback publishes a new
+    (base, array) pair before any length that needs it, and never drops a
+    sample from RAM before the spill thread has copied it to disk. Reads
+    inside the window are views; reads reaching further back are stitched
+    from the spill file.
+    """
+
+    def __init__(self, directory: str, sample_rate: int = 16000, window_seconds: float = WINDOW_SECONDS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.journal = SessionJournal(directory)
+        self._window = int(window_seconds * sample_rate)
+        self._state = (0, np.zeros(2 * self._window, dtype="float32"))  # (base offset, samples)
+        self._length = 0
+        self._spilled = 0
+        self._audio_path = os.path.join(directory, "audio.f32")
+        self._map = None
+        self._grow_map(GROW_SECONDS * sample_rate)
+        self._started = time.time()
+        self._write_header(finished=False)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._spill_loop, daemon=True)
+        self._thread.start()
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def resident_samples(self) -> int:
+        return len(self._state[1])
+
+    def write(self, block: np.ndarray):
+        start = self._length
+        end = start + len(block)
+        base, data = self._state
+        if end - base > len(data):
+            # Slide: keep the last window, but never anything not yet on disk
+            keep = max(base, min(start - self._window, self._spilled))
+            grown = np.empty(max(len(data), 2 * (end - keep)), dtype="float32")
+            grown[:start - keep] = data[keep - base:start - base]
+            self._state = (keep, grown)
+            base, data = keep, grown
+        data[start - base:end - base] = block
+        self._length = end
+
+    def view(self, start: int = 0) -> np.ndarray:
+        length = self._length
+        base, data = self._state
+        start = min(start, length)
+        if start >= base:
+            view = data[start - base:length - base]
+        else:
+            view = np.concatenate((self._map[start:base], data[:length - base]))
+        view.flags.writeable = False
+        return view
+
+    def finish(self) -> np.ndarray:
+        """Stop spilling, flush the rest and return the whole session from disk."""
+        self._stop.set()
+        self._thread.join()
+        self._spill()
+        self._write_header(finished=True)
+        view = self._map[:self._spilled]
+        view.flags.writeable = False
+        return view
+
+    def discard(self):
+        """Delete the session once its transcript has been delivered."""
+        self._stop.set()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _grow_map(self, capacity: int):
+        with open(self._audio_path, "ab") as f:
+            f.truncate(capacity * 4)
+        self._map = np.memmap(self._audio_path, dtype="float32", mode="r+", shape=(capacity,))
+
+    def _spill(self):
+        length = self._length
+        base, data = self._state
+        if length <= self._spilled:
+            return
+        if length > len(self._map):
+            self._grow_map(length + GROW_SECONDS * self.sample_rate)
+        self._map[self._spilled:length] = data[self._spilled - base:length - base]
+        self._map.flush()
+        self._spilled = length
+        self._write_header(finished=False)
+
+    def _spill_loop(self):
+        while not self._stop.wait(SPILL_INTERVAL):
+            self._spill()
+
+    def _write_header(self, finished: bool):
+        _write_json(os.path.join(self.directory, "session.json"), {
+            "sample_rate": self.sample_rate,
+            "samples": self._spilled,
+            "started": self._started,
+            "finished": finished,
+        })
+
+
+# ── Recovery ──────────────────────────────────────────────────────────────
+
+def recover_session(directory: str, transcriber) -> str:
+    """Journaled text plus a decode of the audio after the last journaled segment."""
+    with open(os.path.join(directory, "session.json")) as f:
+        header = json.load(f)
+    entries = SessionJournal(directory).entries()
+    texts = [e["text"] for e in entries if e["text"]]
+    done = max((e["end"] for e in entries), default=0)
+    samples = header["samples"]
+    if samples > done:
+        audio = np.memmap(os.path.join(directory, "audio.f32"), dtype="float32", mode="r",
+                          shape=(samples,))
+        prompt = texts[-1][-200:] if texts else ""
+        texts.append(transcriber.transcribe(np.asarray(audio[done:]), prompt=prompt))
+    return " ".join(t for t in texts if t)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m whisper_flow recover",
+                                     description="Rebuild transcripts of long-form sessions that did not finish")
+    parser.add_argument("sessions", nargs="*", help="Session directories (default: all unfinished)")
+    parser.add_argument("--model", default="base", choices=["tiny", "base", "small", "medium", "large-v3"],
+                        help="Whisper model size for audio not yet transcribed (default: base)")
+    parser.add_argument("--language", default="en", help="Transcription language (default: en)")
+    parser.add_argument("--keep", action="store_true", help="Keep session files after recovering")
+    args = parser.parse_args(argv)
+
+    sessions = args.sessions or unfinished_sessions()
+    if not sessions:
+        print("No unfinished sessions.", file=sys.stderr)
+        return 0
+
+    from .transcriber import Transcriber
+
+    transcriber = Transcriber(model_size=args.model, language=args.language, load=False, idle_unload=None)
+    transcriber.load(stream=False)
+    if transcriber.load_error:
+        print(f"Model failed to load: {transcriber.load_error}", file=sys.stderr)
+        return 1
+    for directory in sessions:
+        text = recover_session(directory, transcriber)
+        path = os.path.join(directory, "transcript.txt")
+        with open(path, "w") as f:
+            f.write(text + "\n")
+        print(f"── {os.path.basename(directory)}", file=sys.stderr)
+        print(text, flush=True)
+        if not args.keep:
+            shutil.rmtree(directory)
+    return 0
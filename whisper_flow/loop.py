@@ -0,0 +1,159 @@
+"""Single event-loop thread for timers and state changes.
+
+Hotkey events, hold detection, stream ticks, decode completions and paste
+timing are all posted here instead of each spawning a Timer or Thread, so
+the dictation state machine only ever runs on one thread. Callbacks must
+not block: anything slow (decoding, model loads) runs elsewhere and posts
+its result back with call().
+
+ManualLoop has the same interface on a fake clock, which makes timing
+deterministic in headless runs; it also serves as the main-thread executor
+for UpdateDispatcher.
+"""
+
+import heapq
+import threading
+import time
+import traceback
+
+
+class Handle:
+    """A scheduled callback; cancel() before it runs and it never will."""
+
+    __slots__ = ("when", "fn", "args", "cancelled")
+
+    def __init__(self, when: float, fn, args):
+        self.when = when
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class _Queue:
+    """Time-ordered callbacks; FIFO among those due at the same time."""
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, Handle]] = []
+        self._seq = 0
+
+    def push(self, handle: Handle):
+        self._seq += 1
+        heapq.heappush(self._heap, (handle.when, self._seq, handle))
+
+    def next_due(self) -> float | None:
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop(self) -> Handle:
+        return heapq.heappop(self._heap)[2]
+
+
+def _run(handle: Handle):
+    try:
+        handle.fn(*handle.args)
+    except Exception:
+        print(f"[philoquent] Event loop callback {getattr(handle.fn, '__name__', handle.fn)} failed:",
+              flush=True)
+        traceback.print_exc()
+
+
+class EventLoop:
+    def __init__(self, name: str = "events"):
+        self._cond = threading.Condition()
+        self._queue = _Queue()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._worker, name=name, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def clock() -> float:
+        return time.monotonic()
+
+    def in_loop(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def call(self, fn, *args) -> Handle:
+        """Run fn(*args) on the loop thread as soon as possible; safe from any thread."""
+        return self.call_later(0.0, fn, *args)
+
+    def call_later(self, delay: float, fn, *args) -> Handle:
+        handle = Handle(self.clock() + max(0.0, delay), fn, args)
+        with self._cond:
+            self._queue.push(handle)
+            self._cond.notify()
+        return handle
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    due = self._queue.next_due()
+                    if due is not None and due <= self.clock():
+                        break
+                    self._cond.wait(None if due is None else due - self.clock())
+                if self._stopped:
+                    return
+                handle = self._queue.pop()
+            _run(handle)
+
+
+class ManualLoop:
+    """Fake loop: callbacks run when run_due() or advance() is called, on a fake clock."""
+
+    def __init__(self):
+        self.now = 0.0
+        self._queue = _Queue()
+        self._lock = threading.Lock()
+
+    def clock(self) -> float:
+        return self.now
+
+    def in_loop(self) -> bool:
+        return True
+
+    def call(self, fn, *args) -> Handle:
+        return self.call_later(0.0, fn, *args)
+
+    def call_later(self, delay: float, fn, *args) -> Handle:
+        handle = Handle(self.now + max(0.0, delay), fn, args)
+        with self._lock:
+            self._queue.push(handle)
+        return handle
+
+    def stop(self):
+        pass
+
+    def advance(self, seconds: float) -> int:
+        """Move the clock forward, running every callback due on the way in time order."""
+        end = self.now + seconds
+        ran = 0
+        while True:
+            with self._lock:
+                due = self._queue.next_due()
+            if due is None or due > end:
+                break
+            self.now = max(self.now, due)
+            ran += self.run_due()
+        self.now = end
+        return ran + self.run_due()
+
+    def run_due(self) -> int:
+        """Run everything due by `now`, including work queued while running."""
+        ran = 0
+        while True:
+            with self._lock:
+                due = self._queue.next_due()
+                if due is None or due > self.now:
+                    return ran
+                handle = self._queue.pop()
+            _run(handle)
+            ran += 1
@@ -0,0 +1,169 @@
+"""Per-stage latency histograms for the dictation pipeline.
+
+Call sites wrap a stage in `with metrics.stage("name"):` or report a
+duration they already measured with `metrics.observe("name", seconds)`.
+While disabled, `stage()` hands out one shared no-op context and
+`observe()` returns immediately, so instrumentation can stay on hot paths.
+Plain event totals (decodes skipped, seconds trimmed) go through
+`metrics.count("name", amount)`. A `tap` callable, when set, sees every
+stage timing even while histograms are disabled; the session tracer uses it.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from .bundle_utils import get_data_dir
+
+# Upper bounds in seconds; one overflow bucket is implied
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_NOOP = nullcontext()
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "max", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        i = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-th quantile."""
+        n = self.count
+        if not n:
+            return None
+        seen = 0
+        for bound, c in zip(BUCKETS + (self.max,), self.counts):
+            seen += c
+            if seen >= q * n:
+                return min(bound, self.max)
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("_metrics", "_name", "_t0")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.observe(self._name, time.perf_counter() - self._t0)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._hists: dict[str, Histogram] = {}
+        self._counters: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.tap = None  # tap(name, seconds) for every stage timing
+
+    def _hist(self, name: str) -> Histogram:
+        hist = self._hists.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self._hists.setdefault(name, Histogram())
+        return hist
+
+    def stage(self, name: str):
+        if not self.enabled and self.tap is None:
+            return _NOOP
+        return _Timer(self, name)
+
+    def observe(self, name: str, seconds: float):
+        if self.enabled:
+            self._hist(name).observe(seconds)
+        tap = self.tap
+        if tap is not None:
+            tap(name, seconds)
+
+    def count(self, name: str, amount: float = 1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self) -> dict:
+        out = {}
+        for name, hist in sorted(self._hists.items()):
+            count = hist.count
+            cumulative, buckets = 0, {}
+            for bound, c in zip(BUCKETS, hist.counts):
+                cumulative += c
+                buckets[str(bound)] = cumulative
+            out[name] = {
+                "count": count,
+                "sum": hist.total,
+                "mean": hist.total / count if count else None,
+                "max": hist.max,
+                "p50": hist.quantile(0.5),
+                "p90": hist.quantile(0.9),
+                "p99": hist.quantile(0.99),
+                "buckets": buckets,
+            }
+        for name, total in sorted(self._counters.items()):
+            out[name] = {"total": total}
+        return out
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP philoquent_stage_seconds Latency of dictation pipeline stages.",
+            "# TYPE philoquent_stage_seconds histogram",
+        ]
+        for name, hist in sorted(self._hists.items()):
+            cumulative = 0
+            for bound, c in zip(BUCKETS, hist.counts):
+                cumulative += c
+                lines.append(f'philoquent_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'philoquent_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {hist.count}')
+            lines.append(f'philoquent_stage_seconds_sum{{stage="{name}"}} {hist.total}')
+            lines.append(f'philoquent_stage_seconds_count{{stage="{name}"}} {hist.count}')
+        if self._counters:
+            lines += [
+                "# HELP philoquent_events_total Pipeline event totals.",
+                "# TYPE philoquent_events_total counter",
+            ]
+            for name, total in sorted(self._counters.items()):
+                lines.append(f'philoquent_events_total{{event="{name}"}} {total}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory: str | None = None) -> tuple[str, str]:
+        """Write metrics.json and metrics.prom (under get_data_dir() by default)."""
+        directory = directory or get_data_dir()
+        json_path = os.path.join(directory, "metrics.json")
+        prom_path = os.path.join(directory, "metrics.prom")
+        _write_atomic(json_path, json.dumps(self.snapshot(), indent=2))
+        _write_atomic(prom_path, self.to_prometheus())
+        return json_path, prom_path
+
+
+def _write_atomic(path: str, text: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+metrics = Metrics(enabled=os.environ.get("PHILOQUENT_METRICS") == "1")
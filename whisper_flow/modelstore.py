@@ -0,0 +1,495 @@
+"""Ready-to-load model variants — one directory per (model size, compute type).
+
+    python -m whisper_flow models                         # list stored variants
+    python -m whisper_flow models prefetch base:int8 tiny:int8
+    python -m whisper_flow models verify
+    python -m whisper_flow models bench --models tiny,base
+
+The Hub models are stored as float16, so loading one with compute_type int8
+(or "auto") quantizes every weight matrix on each launch, after the Hub
+cache has been walked to find the snapshot. The store does that work once:
+it rewrites model.bin with the weights already in the target type, using
+the same per-row scaling CTranslate2 applies at load time, and keeps the
+result next to the tokenizer and config files in a flat directory that
+WhisperModel opens directly.
+
+manifest.json records the size and SHA-256 of every file of every
+variant. Integrity is checked lazily: a load only compares file sizes, and
+the full hash runs on a background thread after the model is up. A variant
+that fails it is dropped from the manifest and rebuilt by the next
+prefetch. Missing variants are built in the background once the app has
+been idle for a while, streaming model.bin one variable at a time, so the
+launch that first needs one loads from the Hub cache as before.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .bundle_utils import get_model_cache_dir
+
+STORE_VERSION = 1
+# What "auto" means on this CPU: the first type CTranslate2 supports
+AUTO_PREFERENCE = ("int8", "int8_float32", "int16", "float32")
+MODEL_FILES = ("model.bin", "config.json", "tokenizer.json", "preprocessor_config.json",
+               "vocabulary.json", "vocabulary.txt")
+HASH_CHUNK = 1 << 22  # bytes read at a time when hashing or warming the page cache
+# Order of the DataType enum in CTranslate2's types.h
+CT2_DTYPES = ("float32", "int8", "int16", "int32", "float16", "bfloat16")
+
+
+def store_dir() -> str:
+    path = os.path.join(get_model_cache_dir(), "store")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def resolve_compute_type(compute_type: str) -> str:
+    """Concrete CPU compute type for *compute_type*, resolving "auto"."""
+    if compute_type != "auto":
+        return compute_type
+    try:
+        import ctranslate2
+        supported = ctranslate2.get_supported_compute_types("cpu")
+    except ImportError:
+        return "float32"
+    return next((c for c in AUTO_PREFERENCE if c in supported), "float32")
+
+
+# ── CTranslate2 model.bin ─────────────────────────────────────────────────
+
+def _read_string(f) -> str:
+    (length,) = struct.unpack("H", f.read(2))
+    return f.read(length)[:-1].decode("utf-8")
+
+
+def _write_string(f, string: str):
+    f.write(struct.pack("H", len(string) + 1))
+    f.write(string.encode("utf-8") + b"\0")
+
+
+def _read_header(f) -> tuple[dict, int]:
+    (version,) = struct.unpack("I", f.read(4))
+    if version < 5:
+        raise ValueError(f"unsupported model.bin version {version}")
+    header = {"version": version, "name": _read_string(f)}
+    (header["revision"],) = struct.unpack("I", f.read(4))
+    (count,) = struct.unpack("I", f.read(4))
+    return header, count
+
+
+def _read_variable(f) -> tuple[str, np.ndarray, str]:
+    name = _read_string(f)
+    (rank,) = struct.unpack("B", f.read(1))
+    shape = struct.unpack(f"{rank}I", f.read(4 * rank))
+    (type_id,) = struct.unpack("B", f.read(1))
+    (nbytes,) = struct.unpack("I", f.read(4))
+    dtype = CT2_DTYPES[type_id]
+    array = np.frombuffer(f.read(nbytes), dtype="uint16" if dtype == "bfloat16" else dtype)
+    return name, array.reshape(shape), dtype
+
+
+def _read_aliases(f) -> list[tuple[str, str]]:
+    (count,) = struct.unpack("I", f.read(4))
+    return [(_read_string(f), _read_string(f)) for _ in range(count)]
+
+
+def _write_header(f, header: dict, count: int):
+    f.write(struct.pack("I", header["version"]))
+    _write_string(f, header["name"])
+    f.write(struct.pack("I", header["revision"]))
+    f.write(struct.pack("I", count))
+
+
+def _write_variable(f, name: str, array: np.ndarray, dtype: str):
+    _write_string(f, name)
+    f.write(struct.pack("B", array.ndim))
+    f.write(struct.pack(f"{array.ndim}I", *array.shape))
+    f.write(struct.pack("B", CT2_DTYPES.index(dtype)))
+    array = np.ascontiguousarray(array)
+    f.write(struct.pack("I", array.nbytes))
+    f.write(array.data)
+
+
+def _write_aliases(f, aliases):
+    f.write(struct.pack("I", len(aliases)))
+    for alias, target in aliases:
+        _write_string(f, alias)
+        _write_string(f, target)
+
+
+def _as_float32(array: np.ndarray, dtype: str) -> np.ndarray:
+    if dtype == "bfloat16":
+        return (array.astype("uint32") << 16).view("float32")
+    return array.astype("float32")
+
+
+def quantize_variables(variables, compute_type: str) -> list[tuple[str, np.ndarray, str]]:
+    """Variables as CTranslate2 holds them in memory after loading with *compute_type* on CPU.
+
+    Every 2-D */weight of a Whisper model is a linear or embedding matrix
+    and gets quantized with a per-row scale, bit for bit as CTranslate2 does
+    when it loads a float model. The encoder's conv kernels stay in float, as
+    they do at runtime, and every other float variable is widened to float32.
+    """
+    out = []
+    for name, array, dtype in variables:
+        is_float = dtype in ("float32", "float16", "bfloat16")
+        if name.endswith("/weight") and is_float and array.ndim == 2:
+            if compute_type in ("int8", "int8_float32"):
+                value = _as_float32(array, dtype)
+                amax = np.maximum(value.max(axis=1), -value.min(axis=1))  # |value|.max without a copy
+                amax[amax == 0] = 127.0
+                scale = (127.0 / amax).astype("float32")
+                value *= scale[:, None]  # in place: the float copy is the largest buffer here
+                quantized = np.rint(value, out=value).astype("int8")
+                out += [(name, quantized, "int8"), (name + "_scale", scale, "float32")]
+                continue
+            if compute_type == "int16":
+                value = _as_float32(array, dtype)
+                scale = np.float32(2 ** 10 / max(value.max(), -value.min()))
+                value *= scale
+                quantized = np.clip(np.rint(value, out=value), -32768, 32767, out=value).astype("int16")
+                out += [(name, quantized, "int16"), (name + "_scale", np.array(scale, dtype="float32"), "float32")]
+                continue
+        if is_float and dtype != "float32":
+            out.append((name, _as_float32(array, dtype), "float32"))
+        else:
+            out.append((name, array, dtype))
+    return out
+
+
+def convert_model(source: str, target: str, compute_type: str):
+    """Write *source* (a CTranslate2 Whisper directory) to *target* with weights in *compute_type*.
+
+    model.bin is streamed one variable at a time, so converting holds about
+    one weight matrix in memory rather than the whole model.
+    """
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    with open(os.path.join(source, "model.bin"), "rb") as src, open(os.path.join(tmp, "model.bin"), "wb") as dst:
+        header, count = _read_header(src)
+        _write_header(dst, header, 0)
+        written = 0
+        for _ in range(count):
+            for variable in quantize_variables([_read_variable(src)], compute_type):
+                _write_variable(dst, *variable)
+                written += 1
+        _write_aliases(dst, _read_aliases(src))
+        # Quantized matrices gain a scale variable, so the count is only known now
+        dst.seek(0)
+        _write_header(dst, header, written)
+    for name in MODEL_FILES[1:]:
+        if os.path.exists(os.path.join(source, name)):
+            shutil.copyfile(os.path.join(source, name), os.path.join(tmp, name))
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_ahead(path: str):
+    """Pull a file into the page cache so the next load reads from memory."""
+    with open(path, "rb") as f:
+        while f.read(HASH_CHUNK):
+            pass
+
+
+# ── Store ─────────────────────────────────────────────────────────────────
+
+class ModelStore:
+    def __init__(self, root: str | None = None, log=print):
+        self.root = root or store_dir()
+        self.log = log
+        self._path = os.path.join(self.root, "manifest.json")
+        self._lock = threading.Lock()
+        self._building: set[str] = set()
+        self._verified: set[str] = set()  # fully hashed in this process
+        self.manifest = self._load_manifest()
+
+    @staticmethod
+    def key(size: str, compute_type: str) -> str:
+        return f"{size}-{compute_type}"
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self._path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {"version": STORE_VERSION, "variants": {}}
+        if manifest.get("version") != STORE_VERSION:
+            return {"version": STORE_VERSION, "variants": {}}
+        return manifest
+
+    def _save_manifest(self):
+        tmp = self._path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self._path)
+
+    def variants(self) -> dict:
+        with self._lock:
+            return dict(self.manifest["variants"])
+
+    # ── Lookup ────────────────────────────────────────────────────────────
+
+    def resolve(self, size: str, compute_type: str) -> tuple[str | None, str]:
+        """(directory, concrete compute type) of a stored variant, or (None, type) if absent.
+
+        Only file sizes are checked here; verify() does the full hash.
+        """
+        compute_type = resolve_compute_type(compute_type)
+        key = self.key(size, compute_type)
+        with self._lock:
+            entry = self.manifest["variants"].get(key)
+        if entry is None:
+            return None, compute_type
+        path = os.path.join(self.root, key)
+        for name, info in entry["files"].items():
+            try:
+                if os.path.getsize(os.path.join(path, name)) != info["size"]:
+                    raise OSError
+            except OSError:
+                self.log(f"Model store: {key} is incomplete, rebuilding")
+                self._drop(key)
+                return None, compute_type
+        return path, compute_type
+
+    def verify(self, size: str, compute_type: str) -> bool:
+        """Hash every file of a variant against the manifest; drop it on mismatch."""
+        key = self.key(size, resolve_compute_type(compute_type))
+        with self._lock:
+            entry = self.manifest["variants"].get(key)
+        if entry is None:
+            return False
+        path = os.path.join(self.root, key)
+        for name, info in entry["files"].items():
+            try:
+                ok = _sha256(os.path.join(path, name)) == info["sha256"]
+            except OSError:
+                ok = False
+            if not ok:
+                self.log(f"Model store: {key}/{name} failed its checksum, dropping the variant")
+                self._drop(key)
+                return False
+        self._verified.add(key)
+        return True
+
+    def verify_later(self, size: str, compute_type: str):
+        key = self.key(size, resolve_compute_type(compute_type))
+        if key not in self._verified:
+            threading.Thread(target=self.verify, args=(size, compute_type), daemon=True).start()
+
+    # ── Building ──────────────────────────────────────────────────────────
+
+    def build(self, size: str, compute_type: str, source: str | None = None) -> str:
+        """Convert the Hub snapshot (or *source*) into a stored variant; returns its directory."""
+        compute_type = resolve_compute_type(compute_type)
+        key = self.key(size, compute_type)
+        if source is None:
+            from faster_whisper.utils import download_model
+            source = download_model(size, cache_dir=get_model_cache_dir())
+        t0 = time.monotonic()
+        path = os.path.join(self.root, key)
+        convert_model(source, path, compute_type)
+        files = {
+            name: {"size": os.path.getsize(os.path.join(path, name)), "sha256": _sha256(os.path.join(path, name))}
+            for name in sorted(os.listdir(path))
+        }
+        with self._lock:
+            self.manifest["variants"][key] = {
+                "size": size,
+                "compute_type": compute_type,
+                "source": os.path.realpath(source),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "files": files,
+            }
+            self._save_manifest()
+        self._verified.add(key)
+        self.log(f"Model store: built {key} in {time.monotonic() - t0:.1f}s")
+        return path
+
+    def prefetch(self, pairs, warm: bool = True, wait=None) -> threading.Thread:
+        """Build missing variants and read stored ones into the page cache, in the background.
+
+        *wait*, if given, is called before each build and returns when
+        converting will not get in the way of transcription.
+        """
+        def run():
+            for size, compute_type in pairs:
+                compute_type = resolve_compute_type(compute_type)
+                key = self.key(size, compute_type)
+                with self._lock:
+                    if key in self._building:
+                        continue
+                    self._building.add(key)
+                try:
+                    path, _ = self.resolve(size, compute_type)
+                    if path is None:
+                        if wait:
+                            wait()
+                        self.build(size, compute_type)
+                    elif warm:
+                        _read_ahead(os.path.join(path, "model.bin"))
+                except Exception as e:
+                    self.log(f"Model store: could not prepare {key}: {e}")
+                finally:
+                    with self._lock:
+                        self._building.discard(key)
+
+        thread = threading.Thread(target=run, name="model-prefetch", daemon=True)
+        thread.start()
+        return thread
+
+    def remove(self, size: str, compute_type: str):
+        self._drop(self.key(size, resolve_compute_type(compute_type)))
+
+    def _drop(self, key: str):
+        with self._lock:
+            self.manifest["variants"].pop(key, None)
+            self._save_manifest()
+        self._verified.discard(key)
+        shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+
+# ── Cold-load benchmark ───────────────────────────────────────────────────
+
+_LOAD_SNIPPET = """
+import sys, time
+t0 = time.perf_counter()
+from faster_whisper import WhisperModel
+t1 = time.perf_counter()
+WhisperModel(sys.argv[1], device="cpu", compute_type=sys.argv[2], download_root=sys.argv[3] or None)
+print(time.perf_counter() - t1)
+"""
+
+
+def _timed_load(model: str, compute_type: str, download_root: str = "") -> float:
+    """Seconds to construct WhisperModel in a fresh interpreter (imports excluded)."""
+    result = subprocess.run([sys.executable, "-c", _LOAD_SNIPPET, model, compute_type, download_root],
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def _evict(directory: str) -> bool:
+    """Drop *directory*'s files from the page cache; False where the OS offers no way to."""
+    if not hasattr(os, "posix_fadvise"):
+        return False  # macOS: only a system-wide `sudo purge` would do it
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return True
+
+
+def _cold_and_warm(directory: str, load, repeats: int) -> tuple[float | None, float]:
+    """(first load after evicting *directory* from the page cache or None, fastest of *repeats* more)."""
+    cold = load() if _evict(directory) else None
+    return cold, min(load() for _ in range(repeats))
+
+
+def cold_load_bench(store: ModelStore, sizes, compute_type: str = "auto", repeats: int = 3,
+                    source: str | None = None) -> list[dict]:
+    """Load time per size from the Hub cache (converting at load) against the stored variant.
+
+    Each side is loaded once with its files evicted from the page cache (a
+    true cold start; None where eviction is not possible) and then *repeats*
+    times warm, of which the fastest counts. With *source*, a local
+    CTranslate2 Whisper directory stands in for the Hub snapshot (one size
+    only).
+    """
+    records = []
+    for size in sizes:
+        path, concrete = store.resolve(size, compute_type)
+        if path is None:
+            path = store.build(size, concrete, source=source)
+        if source:
+            hub_dir, hub = source, lambda: _timed_load(source, compute_type)
+        else:
+            from faster_whisper.utils import download_model
+            hub_dir = download_model(size, cache_dir=get_model_cache_dir())
+            hub = lambda: _timed_load(size, compute_type, get_model_cache_dir())
+        hub_cold, hub_warm = _cold_and_warm(hub_dir, hub, repeats)
+        store_cold, store_warm = _cold_and_warm(path, lambda: _timed_load(path, concrete), repeats)
+        cold = hub_cold is not None and store_cold is not None
+        records.append({"model": size, "compute_type": concrete,
+                        "hub_cold_s": hub_cold, "hub_warm_s": hub_warm,
+                        "store_cold_s": store_cold, "store_warm_s": store_warm,
+                        "speedup_cold": hub_cold / store_cold if cold and store_cold else None,
+                        "speedup_warm": hub_warm / store_warm if store_warm else None})
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m whisper_flow models",
+                                     description="Manage pre-converted model variants")
+    parser.add_argument("action", nargs="?", default="list", choices=["list", "prefetch", "verify", "remove", "bench"])
+    parser.add_argument("variants", nargs="*", metavar="SIZE:TYPE",
+                        help="Variants for prefetch/verify/remove, e.g. base:int8 (default: all stored)")
+    parser.add_argument("--models", default="tiny,base", help="Model sizes for bench (default: tiny,base)")
+    parser.add_argument("--compute-type", default="auto", help="Compute type for bench (default: auto)")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Warm loads per measurement for bench, after the cold one; fastest counts")
+    parser.add_argument("--source", metavar="DIR",
+                        help="Bench a local CTranslate2 Whisper directory instead of the Hub model")
+    args = parser.parse_args(argv)
+
+    log = lambda msg: print(msg, file=sys.stderr, flush=True)
+    store = ModelStore(log=log)
+    pairs = [tuple(v.split(":", 1)) if ":" in v else (v, "auto") for v in args.variants]
+    if not pairs:
+        pairs = [(e["size"], e["compute_type"]) for e in store.variants().values()]
+
+    if args.action == "list":
+        for key, entry in sorted(store.variants().items()):
+            mb = sum(f["size"] for f in entry["files"].values()) / 1e6
+            print(f"{key:<24} {mb:>8.1f} MB  {entry['created']}")
+        return 0
+    if args.action == "prefetch":
+        if not args.variants:
+            parser.error("prefetch needs at least one SIZE:TYPE")
+        store.prefetch(pairs, warm=False).join()
+        return 0
+    if args.action == "verify":
+        failed = [f"{s}:{c}" for s, c in pairs if not store.verify(s, c)]
+        print("All variants verified." if not failed else f"Failed: {', '.join(failed)}", file=sys.stderr)
+        return 1 if failed else 0
+    if args.action == "remove":
+        for size, compute_type in pairs:
+            store.remove(size, compute_type)
+        return 0
+
+    sizes = args.models.split(",")
+    if args.source and len(sizes) != 1:
+        parser.error("--source needs exactly one --models name")
+    results = cold_load_bench(store, sizes, args.compute_type, args.repeats, args.source)
+    fmt = lambda seconds: "n/a" if seconds is None else f"{seconds:.2f}s"
+    print("model     compute       hub cold  hub warm  store cold  store warm  speedup cold  speedup warm")
+    for r in results:
+        cold = "n/a" if r["speedup_cold"] is None else f"{r['speedup_cold']:.1f}x"
+        print(f"{r['model']:<9} {r['compute_type']:<13} {fmt(r['hub_cold_s']):>8}  {fmt(r['hub_warm_s']):>8}"
+              f"  {fmt(r['store_cold_s']):>10}  {fmt(r['store_warm_s']):>10}  {cold:>12}  {r['speedup_warm']:>11.1f}x")
+    if any(r["hub_cold_s"] is None for r in results):
+        print("Cold loads need page-cache eviction, which this OS does not offer; warm figures only.",
+              file=sys.stderr)
+    return 0
@@ -1,6 +1,11 @@
-"""Floating on-screen overlay — dark pill with live transcription."""
+"""Floating on-screen overlay — dark pill with live transcription.
 
-import threading
+The show_* methods only describe the state to display; an UpdateDispatcher
+coalesces them and renders the latest one on the main thread at most
+`fps` times a second.
+"""
+
+import time
 
 import objc
 from AppKit import (
@@ -22,6 +27,8 @@ from Foundation import NSMakeRect, NSObject
 import Quartz
 from Quartz import CABasicAnimation
 
+from .dispatch import OVERLAY_FPS, UpdateDispatcher
+
 
 # ── Thread-safe main-thread dispatch ──────────────────────────────────────
 
@@ -37,9 +44,23 @@ class _Invoker(NSObject):
         self._block()
 
 
-def _on_main(fn):
-    inv = _Invoker.alloc().initWithBlock_(fn)
-    inv.performSelectorOnMainThread_withObject_waitUntilDone_(b"invoke:", None, False)
+class _MainThreadExecutor:
+    """Runs callables on the AppKit main thread, reusing one invoker per callable."""
+
+    def __init__(self):
+        self._invokers = {}
+
+    def _invoker(self, fn):
+        inv = self._invokers.get(fn)
+        if inv is None:
+            inv = self._invokers[fn] = _Invoker.alloc().initWithBlock_(fn)
+        return inv
+
+    def call(self, fn):
+        self._invoker(fn).performSelectorOnMainThread_withObject_waitUntilDone_(b"invoke:", None, False)
+
+    def call_later(self, delay, fn):
+        self._invoker(fn).performSelector_withObject_afterDelay_(b"invoke:", None, delay)
 
 
 # ── Overlay ───────────────────────────────────────────────────────────────
@@ -58,7 +79,7 @@ class Overlay:
     DOT_GREEN = Quartz.CGColorCreateGenericRGB(0.20, 0.82, 0.40, 1.0)
     DOT_AMBER = Quartz.CGColorCreateGenericRGB(0.95, 0.75, 0.20, 1.0)
 
-    def __init__(self):
+    def __init__(self, fps: float = OVERLAY_FPS):
         screen = NSScreen.mainScreen().frame()
         x = (screen.size.width - self.WIDTH) / 2
         y = screen.size.height * 0.10
@@ -118,64 +139,65 @@ class Overlay:
         content.addSubview_(self._label)
         self._panel.setContentView_(content)
 
-        self._hide_timer = None
+        self._hide_at = None  # monotonic deadline of the pending auto-hide
+        self._executor = _MainThreadExecutor()
+        self.dispatcher = UpdateDispatcher(self._render, self._executor, fps=fps)
 
     # ── Public API ────────────────────────────────────────────────────────
 
     def show_recording(self):
-        def _do():
-            self._cancel_hide()
-            self._dot.layer().setBackgroundColor_(self.DOT_RED)
-            self._start_pulse()
-            self._label.setTextColor_(self.TEXT_COLOR)
-            self._label.setStringValue_("Listening...")
-            self._fade_in()
-        _on_main(_do)
+        self.dispatcher.submit(("recording", "Listening..."))
 
     def show_streaming(self, text):
         """Update overlay with partial transcription while still recording."""
-        def _do():
-            display = text if len(text) < 70 else text[-67:] + "..."
-            self._label.setStringValue_(display + " \u258C")  # block cursor
-            self._label.setTextColor_(self.TEXT_COLOR)
-        _on_main(_do)
+        display = text if len(text) < 70 else text[-67:] + "..."
+        self.dispatcher.submit(("streaming", display + " \u258C"))  # block cursor
 
     def show_transcribing(self):
-        def _do():
-            self._stop_pulse()
-            self._dot.layer().setBackgroundColor_(self.DOT_AMBER)
-            self._label.setTextColor_(self.MUTED_COLOR)
-            self._label.setStringValue_("Transcribing...")
-        _on_main(_do)
+        self.dispatcher.submit(("transcribing", "Transcribing..."))
 
     def show_result(self, text):
-        def _do():
-            self._stop_pulse()
-            self._dot.layer().setBackgroundColor_(self.DOT_GREEN)
-            self._label.setTextColor_(self.TEXT_COLOR)
-            display = text if len(text) < 70 else text[:67] + "..."
-            self._label.setStringValue_(display)
-            self._schedule_hide(3.5)
-        _on_main(_do)
+        display = text if len(text) < 70 else text[:67] + "..."
+        self.dispatcher.submit(("result", display))
 
     def show_error(self, msg):
-        def _do():
-            self._stop_pulse()
-            self._dot.layer().setBackgroundColor_(self.DOT_RED)
-            self._label.setTextColor_(self.MUTED_COLOR)
-            self._label.setStringValue_(msg)
-            self._schedule_hide(3.0)
-        _on_main(_do)
+        self.dispatcher.submit(("error", msg))
 
     def hide(self):
-        _on_main(self._fade_out)
+        self.dispatcher.submit(("hidden", None))
 
     def cancel(self):
-        def _do():
+        self.hide()
+
+    # ── Rendering (main thread) ───────────────────────────────────────────
+
+    def _render(self, state, previous):
+        kind, text = state
+        was = previous[0] if previous else "hidden"
+        if kind == "hidden":
             self._stop_pulse()
             self._cancel_hide()
             self._fade_out()
-        _on_main(_do)
+            return
+
+        self._cancel_hide()
+        live = kind in ("recording", "streaming")
+        if live and was not in ("recording", "streaming"):
+            self._dot.layer().setBackgroundColor_(self.DOT_RED)
+            self._start_pulse()
+        elif not live:
+            self._stop_pulse()
+            dot = {"transcribing": self.DOT_AMBER, "result": self.DOT_GREEN}.get(kind, self.DOT_RED)
+            self._dot.layer().setBackgroundColor_(dot)
+        muted = kind in ("transcribing", "error")
+        self._label.setTextColor_(self.MUTED_COLOR if muted else self.TEXT_COLOR)
+        self._label.setStringValue_(text)
+        if was == "hidden":
+            self._fade_in()
+        if kind == "result":
+            self._schedule_hide(3.5)
+        elif kind == "error":
+            self._schedule_hide(3.0)
 
     # ── Animations ────────────────────────────────────────────────────────
 
@@ -208,11 +230,14 @@ class Overlay:
     # ── Timers ────────────────────────────────────────────────────────────
 
     def _schedule_hide(self, seconds):
-        self._cancel_hide()
-        self._hide_timer = threading.Timer(seconds, self.hide)
-        self._hide_timer.start()
+        # Runs on the main thread; a newer state clears the deadline instead of cancelling
+        self._hide_at = time.monotonic() + seconds
+        self._executor.call_later(seconds, self._hide_if_due)
 
     def _cancel_hide(self):
-        if self._hide_timer:
-            self._hide_timer.cancel()
-            self._hide_timer = None
+        self._hide_at = None
+
+    def _hide_if_due(self):
+        if self._hide_at is not None and time.monotonic() >= self._hide_at - 0.01:
+            self._hide_at = None
+            self.hide()
@@ -1,15 +1,67 @@
-"""Audio recording from the default microphone."""
+"""Audio recording from the default microphone.
+
+The input stream opens at the device's native rate and block size; when
+that is not 16 kHz, each callback block is converted with a
+StreamingResampler before it is buffered. Samples go into one growing
+in-memory buffer, or with long_form=True into a longform.SpillBuffer that
+keeps a window in RAM and the rest on disk.
+"""
 
 import threading
 
 import numpy as np
 import sounddevice as sd
 
+from .longform import SpillBuffer, new_session_dir
+from .resample import StreamingResampler
+from .trace import tracer
+from .vad import VoiceActivityTracker
+
+INITIAL_SECONDS = 30  # preallocated capacity per session; doubles when exceeded
+
+
+class _SampleBuffer:
+    """Growable contiguous float32 buffer with a single writer.
+
+    Readers never lock: the writer fills samples past the cursor before
+    publishing the new length, and swaps in a grown array before the length
+    that needs it, so `data[:length]` is valid for any (length, data) pair a
+    reader observes in that order.
+    """
+
+    def __init__(self, capacity: int):
+        self._data = np.zeros(capacity, dtype="float32")
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def write(self, block: np.ndarray):
+        start = self._length
+        end = start + len(block)
+        data = self._data
+        if end > len(data):
+            grown = np.empty(max(end, 2 * len(data)), dtype="float32")
+            grown[:start] = data[:start]
+            self._data = data = grown
+        data[start:end] = block
+        self._length = end
+
+    def view(self, start: int = 0) -> np.ndarray:
+        length = self._length
+        view = self._data[min(start, length):length]
+        view.flags.writeable = False
+        return view
+
 
 class AudioRecorder:
-    def __init__(self, sample_rate: int = 16000):
+    def __init__(self, sample_rate: int = 16000, long_form: bool = False):
         self.sample_rate = sample_rate
-        self._frames: list[np.ndarray] = []
+        self.long_form = long_form
+        self._buffer = _SampleBuffer(0)
+        self.device_rate = sample_rate  # capture rate of the current (or last) session
+        self._resampler = None
+        self.vad = VoiceActivityTracker(sample_rate)
         self._recording = False
         self._stream = None
         self._lock = threading.Lock()
@@ -18,19 +70,44 @@ class AudioRecorder:
     def is_recording(self) -> bool:
         return self._recording
 
+    @property
+    def num_samples(self) -> int:
+        """Samples captured so far in the current (or last) session."""
+        return len(self._buffer)
+
+    @property
+    def journal(self):
+        """SessionJournal of the current long-form session, else None."""
+        return getattr(self._buffer, "journal", None)
+
     def get_audio_snapshot(self) -> np.ndarray:
-        """Return a copy of audio captured so far without stopping."""
-        with self._lock:
-            if self._frames:
-                return np.concatenate(self._frames, axis=0).flatten()
-            return np.array([], dtype="float32")
+        """Return a read-only view of audio captured so far without stopping."""
+        return self._buffer.view()
+
+    def get_samples_since(self, offset: int) -> np.ndarray:
+        """Return a read-only view of audio captured after sample *offset*."""
+        return self._buffer.view(offset)
 
     def start(self):
         with self._lock:
-            self._frames = []
+            # Fresh buffer per session so views handed out earlier stay intact
+            if self.long_form:
+                self._buffer = SpillBuffer(new_session_dir(), self.sample_rate)
+            else:
+                self._buffer = _SampleBuffer(INITIAL_SECONDS * self.sample_rate)
+            self.vad.reset()
+            self.device_rate = self._native_rate()
+            if self.device_rate != self.sample_rate:
+                if not self._resampler or self._resampler.in_rate != self.device_rate:
+                    self._resampler = StreamingResampler(self.device_rate, self.sample_rate)
+                self._resampler.reset()
+            else:
+                self._resampler = None
+            tracer.note(device_rate=self.device_rate)
             self._recording = True
             self._stream = sd.InputStream(
-                samplerate=self.sample_rate,
+                samplerate=self.device_rate,
+                blocksize=0,  # whatever the host prefers
                 channels=1,
                 dtype="float32",
                 callback=self._callback,
@@ -44,10 +121,33 @@ class AudioRecorder:
                 self._stream.stop()
                 self._stream.close()
                 self._stream = None
-            if self._frames:
-                return np.concatenate(self._frames, axis=0).flatten()
-            return np.array([], dtype="float32")
+                if self._resampler:
+                    self._write(self._resampler.flush())
+            if isinstance(self._buffer, SpillBuffer):
+                return self._buffer.finish()
+            return self._buffer.view()
+
+    def close_session(self):
+        """The transcript was delivered; drop long-form spill files."""
+        if isinstance(self._buffer, SpillBuffer):
+            self._buffer.discard()
+
+    def _native_rate(self) -> int:
+        try:
+            return int(sd.query_devices(kind="input")["default_samplerate"])
+        except Exception:
+            return self.sample_rate
+
+    def _write(self, block: np.ndarray):
+        if len(block):
+            self._buffer.write(block)
+            self.vad.feed(block)
 
     def _callback(self, indata, frames, time, status):
         if self._recording:
-            self._frames.append(indata.copy())
+            block = indata[:, 0]
+            if tracer.active:
+                tracer.audio(block)
+            if self._resampler:
+                block = self._resampler.process(block)
+            self._write(block)
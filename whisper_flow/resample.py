@@ -0,0 +1,82 @@
+"""Streaming rational-ratio resampling for device-rate capture.
+
+Microphones usually run at 44.1 or 48 kHz. AudioRecorder captures at the
+device's own rate and converts each callback block to 16 kHz here, rather
+than leaving it to the host audio layer.
+
+StreamingResampler is a polyphase FIR: for a ratio up/down it keeps `up`
+sub-filters (one Kaiser-windowed sinc, split by phase) spanning SPAN output
+samples' worth of input, and computes every output sample of a block in one
+gather and multiply-sum. The last taps - 1 input samples and the fractional position
+of the next output carry over between blocks, so feeding a signal in any
+block sizes gives the same output as feeding it at once.
+"""
+
+from math import ceil, gcd
+
+import numpy as np
+
+SPAN = 16  # filter length in output samples; sets the transition band width
+KAISER_BETA = 8.6  # about 80 dB stopband attenuation
+ROLLOFF = 0.9  # passband edge as a fraction of the output Nyquist frequency
+
+
+def phase_taps(up: int, down: int, span: int = SPAN) -> int:
+    """Coefficients per phase for a filter *span* output samples long."""
+    return ceil(span * max(up, down) / up)
+
+
+def design_filter(up: int, down: int, taps: int, beta: float = KAISER_BETA,
+                  rolloff: float = ROLLOFF) -> np.ndarray:
+    """Polyphase bank of shape (up, taps) for resampling by up/down."""
+    length = taps * up
+    cutoff = rolloff * 0.5 / max(up, down)  # cycles per sample at the upsampled rate
+    n = np.arange(length) - length // 2  # centred on a whole upsampled sample
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta)
+    h *= up / h.sum()  # unity DC gain after zero-stuffing
+    # bank[p, k] = h[p + k * up]
+    return np.ascontiguousarray(h.reshape(taps, up).T, dtype="float32")
+
+
+class StreamingResampler:
+    def __init__(self, in_rate: int, out_rate: int = 16000, span: int = SPAN):
+        g = gcd(int(in_rate), int(out_rate))
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        self.up = self.out_rate // g
+        self.down = self.in_rate // g
+        self.taps = taps = phase_taps(self.up, self.down, span)
+        # Reverse each phase so a forward window of input lines up with it
+        self._bank = design_filter(self.up, self.down, taps)[:, ::-1].copy()
+        self._offsets = np.arange(taps)
+        self.delay = taps / 2  # input samples the filter looks ahead
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.taps - 1, dtype="float32")
+        # Position of the next output in 1/up input samples, starting one group
+        # delay in so output sample 0 lines up with input sample 0
+        self._t = (self.taps - 1) * self.up + self.taps * self.up // 2
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Resample one block; returns the output samples it completes."""
+        x = np.concatenate((self._history, np.asarray(block, dtype="float32")))
+        available = len(x) * self.up  # outputs need base = t // up < len(x)
+        count = max(0, -(-(available - self._t) // self.down))
+        if count:
+            t = self._t + self.down * np.arange(count)
+            base = t // self.up
+            windows = x[(base - (self.taps - 1))[:, None] + self._offsets]
+            out = np.einsum("ij,ij->i", windows, self._bank[t % self.up])
+            self._t += self.down * count
+        else:
+            out = np.zeros(0, dtype="float32")
+        consumed = len(x) - (self.taps - 1)
+        self._history = x[consumed:].copy()
+        self._t -= consumed * self.up
+        return out
+
+    def flush(self) -> np.ndarray:
+        """Output still held back by the filter delay, padding the input with silence."""
+        pad = int(np.ceil(self.delay)) + 1
+        return self.process(np.zeros(pad, dtype="float32"))
@@ -0,0 +1,177 @@
+"""Model residency — keep loaded models within a memory budget, unload idle ones."""
+
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+# Rough resident size of a loaded model with compute_type="auto" on CPU (MB)
+MODEL_SIZE_MB = {
+    "tiny": 100,
+    "base": 200,
+    "small": 500,
+    "medium": 1200,
+    "large-v3": 2400,
+}
+REAP_INTERVAL = 30.0  # seconds between idle checks
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (0.0 if unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        pass
+    try:
+        out = subprocess.run(["ps", "-o", "rss=", "-p", str(os.getpid())],
+                             capture_output=True, text=True).stdout
+        return int(out.strip()) / 1024
+    except (OSError, ValueError):
+        return 0.0
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class _Entry:
+    def __init__(self, loader, size_mb, pinned, idle_seconds):
+        self.loader = loader
+        self.size_mb = size_mb
+        self.pinned = pinned
+        self.idle_seconds = idle_seconds
+        self.model = None
+        self.last_used = 0.0
+        self.load_lock = threading.Lock()
+
+
+class ModelResidency:
+    """Loads models on demand and unloads the ones that sit idle.
+
+    Keys are registered with a loader. `get()` returns the resident model or
+    loads it (a miss); before loading, idle unpinned models are evicted in LRU
+    order until the new one fits in *budget_mb*. A reaper thread unloads
+    unpinned models unused for longer than their idle timeout.
+    """
+
+    def __init__(self, budget_mb: float | None = None, idle_seconds: float | None = None):
+        self.budget_mb = budget_mb
+        self.idle_seconds = idle_seconds
+        self._entries: dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.unloads = 0
+        self.load_seconds = 0.0
+        threading.Thread(target=self._reap, name="residency", daemon=True).start()
+
+    def register(self, key: str, loader, size_mb: float | None = None,
+                 pinned: bool = False, idle_seconds: float | None = None):
+        with self._lock:
+            if key in self._entries:
+                self._entries[key].pinned |= pinned
+                return
+            self._entries[key] = _Entry(
+                loader,
+                size_mb if size_mb is not None else MODEL_SIZE_MB.get(key, 500),
+                pinned,
+                idle_seconds if idle_seconds is not None else self.idle_seconds,
+            )
+
+    def is_resident(self, key: str) -> bool:
+        return self._entries[key].model is not None
+
+    def peek(self, key: str):
+        """Resident model for *key* or None, without loading or touching LRU state."""
+        entry = self._entries.get(key)
+        return entry.model if entry else None
+
+    def get(self, key: str, prefetch: bool = False):
+        entry = self._entries[key]
+        with entry.load_lock:
+            if entry.model is None:
+                if not prefetch:
+                    with self._lock:
+                        self.misses += 1
+                self._make_room(key, entry.size_mb)
+                t0 = time.monotonic()
+                entry.model = entry.loader()
+                with self._lock:
+                    self.loads += 1
+                    self.load_seconds += time.monotonic() - t0
+            elif not prefetch:
+                with self._lock:
+                    self.hits += 1
+            entry.last_used = time.monotonic()
+            return entry.model
+
+    def idle_for(self) -> float:
+        """Seconds since any model was last handed out."""
+        last = max((entry.last_used for entry in self._entries.values()), default=0.0)
+        return time.monotonic() - last
+
+    def prefetch(self, key: str):
+        """Start loading *key* in the background if it isn't resident."""
+        if self.is_resident(key):
+            self._entries[key].last_used = time.monotonic()
+            return
+        threading.Thread(target=self.get, args=(key, True), daemon=True).start()
+
+    def unload(self, key: str):
+        entry = self._entries[key]
+        with self._lock:
+            if entry.model is None:
+                return
+            entry.model = None
+            self.unloads += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            resident = [k for k, e in self._entries.items() if e.model is not None]
+            return {
+                "resident": resident,
+                "resident_mb": sum(self._entries[k].size_mb for k in resident),
+                "budget_mb": self.budget_mb,
+                "rss_mb": round(current_rss_mb(), 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "unloads": self.unloads,
+                "load_seconds": round(self.load_seconds, 2),
+            }
+
+    def _make_room(self, key: str, size_mb: float):
+        if self.budget_mb is None:
+            return
+        with self._lock:
+            resident = sorted(
+                (e.last_used, k) for k, e in self._entries.items()
+                if e.model is not None and k != key
+            )
+            used = sum(self._entries[k].size_mb for _, k in resident)
+            for _, k in resident:
+                if used + size_mb <= self.budget_mb:
+                    break
+                entry = self._entries[k]
+                if entry.pinned or entry.load_lock.locked():
+                    continue
+                entry.model = None
+                self.unloads += 1
+                used -= entry.size_mb
+
+    def _reap(self):
+        while True:
+            time.sleep(REAP_INTERVAL)
+            now = time.monotonic()
+            for key, entry in list(self._entries.items()):
+                if (entry.model is not None and not entry.pinned and entry.idle_seconds
+                        and now - entry.last_used > entry.idle_seconds
+                        and not entry.load_lock.locked()):
+                    self.unload(key)
@@ -0,0 +1,153 @@
+"""Single inference scheduler — one worker thread owns every Transcriber call.
+
+Final jobs run first, in submission order; stream jobs only run when no final
+work is queued. At most one stream job waits at a time: a newer one replaces
+it. Jobs tagged with a session are dropped (their futures cancelled) once the
+session has ended, whether they were still queued or already running.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+
+
+class _Job:
+    __slots__ = ("fn", "args", "session", "future", "submitted")
+
+    def __init__(self, fn, args, session):
+        self.fn = fn
+        self.args = args
+        self.session = session
+        self.future = Future()
+        self.submitted = time.monotonic()
+
+
+class InferenceScheduler:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._final: deque[_Job] = deque()
+        self._stream: _Job | None = None
+        self._active: set[int] = set()
+        self._next_session = 0
+        self._running = False
+
+        self._completed = 0
+        self._replaced = 0
+        self._dropped = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_last = 0.0
+
+        self._thread = threading.Thread(target=self._worker, name="inference", daemon=True)
+        self._thread.start()
+
+    # ── Sessions ──────────────────────────────────────────────────────────
+
+    def begin_session(self) -> int:
+        with self._cond:
+            self._next_session += 1
+            self._active.add(self._next_session)
+            return self._next_session
+
+    def end_session(self, session: int):
+        """Forget *session*: its queued jobs are cancelled, running ones discarded."""
+        with self._cond:
+            self._active.discard(session)
+            if self._stream and self._stream.session == session:
+                self._stream.future.cancel()
+                self._stream = None
+                self._dropped += 1
+            kept = deque()
+            for job in self._final:
+                if job.session == session:
+                    job.future.cancel()
+                    self._dropped += 1
+                else:
+                    kept.append(job)
+            self._final = kept
+
+    # ── Submission ────────────────────────────────────────────────────────
+
+    def submit_final(self, fn, *args, session: int | None = None) -> Future:
+        job = _Job(fn, args, session)
+        with self._cond:
+            self._final.append(job)
+            self._cond.notify()
+        return job.future
+
+    def submit_stream(self, fn, *args, session: int | None = None) -> Future:
+        job = _Job(fn, args, session)
+        with self._cond:
+            if self._stream:
+                self._stream.future.cancel()
+                self._replaced += 1
+            self._stream = job
+            self._cond.notify()
+        return job.future
+
+    # ── Monitoring ────────────────────────────────────────────────────────
+
+    @property
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._final) + (1 if self._stream else 0)
+
+    def stats(self) -> dict:
+        with self._cond:
+            started = self._completed + self._dropped
+            return {
+                "queue_depth": len(self._final) + (1 if self._stream else 0),
+                "busy": self._running,
+                "completed": self._completed,
+                "replaced": self._replaced,
+                "dropped": self._dropped,
+                "wait_last": self._wait_last,
+                "wait_max": self._wait_max,
+                "wait_mean": self._wait_total / started if started else 0.0,
+            }
+
+    # ── Worker ────────────────────────────────────────────────────────────
+
+    def _next_job(self) -> _Job:
+        with self._cond:
+            while not self._final and not self._stream:
+                self._cond.wait()
+            if self._final:
+                job = self._final.popleft()
+            else:
+                job, self._stream = self._stream, None
+            wait = time.monotonic() - job.submitted
+            self._wait_last = wait
+            self._wait_max = max(self._wait_max, wait)
+            self._wait_total += wait
+            self._running = True
+            return job
+
+    def _is_stale(self, job: _Job) -> bool:
+        return job.session is not None and job.session not in self._active
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            result = error = None
+            if not job.future.cancelled() and not self._is_stale(job):
+                try:
+                    result = job.fn(*job.args)
+                except BaseException as e:
+                    error = e
+
+            with self._cond:
+                self._running = False
+                if job.future.cancelled() or self._is_stale(job):
+                    job.future.cancel()
+                    self._dropped += 1
+                    continue
+                self._completed += 1
+            try:
+                if error is not None:
+                    job.future.set_exception(error)
+                else:
+                    job.future.set_result(result)
+            except InvalidStateError:
+                pass  # cancelled by the caller while running
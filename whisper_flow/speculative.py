@@ -0,0 +1,131 @@
+"""Speculative final transcription — decode closed segments while still recording.
+
+Speech is cut at pauses as it arrives and each closed segment is queued as a
+final job on the inference scheduler. When recording stops only the last, still
+open segment has to be decoded before the pieces are stitched together.
+When the recorder tracks voice activity and it has heard clear speech,
+silence before the first and after the last speech frame is left out of the
+decoded segments. The trailing pad is generous because a soft last word can
+fall below the speech threshold.
+"""
+
+from concurrent.futures import Future
+
+import numpy as np
+
+from .metrics import metrics
+from .vad import FRAME_SECONDS, find_silence_boundary, quietest_point
+
+MIN_SEGMENT_SECONDS = 2.0  # don't bother closing segments shorter than this
+MAX_SEGMENT_SECONDS = 25.0  # force a cut before Whisper's 30 s window
+PROMPT_CHARS = 200  # previous segment text used as decoder context
+HOP = 160  # cuts snap to the mel hop so cached features line up
+SPEECH_PAD_SECONDS = 0.3  # audio kept before the first detected speech when trimming
+TRAILING_PAD_SECONDS = 1.0  # audio kept after the last detected speech when trimming
+MIN_SPEECH_SECONDS = 0.5  # detected speech needed before any silence is trimmed
+
+
+def clear_speech(vad) -> bool:
+    """Whether *vad* (a VoiceActivityTracker, or None) has heard enough speech to trim around."""
+    if vad is None or vad.speech_start is None:
+        return False
+    return vad.speech_frames * FRAME_SECONDS >= MIN_SPEECH_SECONDS
+
+
+class SpeculativeFinalizer:
+    def __init__(self, transcriber, recorder, scheduler, sample_rate: int = 16000):
+        self.transcriber = transcriber
+        self.recorder = recorder
+        self.scheduler = scheduler
+        self.sample_rate = sample_rate
+        self.trimmed_seconds = 0.0  # silence left out of decodes, across sessions
+        self.on_segment = None  # called with each segment's text as it is decoded, in order
+        self.reset()
+
+    def reset(self):
+        self._closed = 0  # samples already handed to the final model
+        self._results: list[Future] = []
+        self._durations: list[float] = []  # seconds of audio behind each of _results
+
+    @property
+    def closed_samples(self) -> int:
+        return self._closed
+
+    def poll(self):
+        """Close and submit the next segment if a pause has ended it."""
+        self._skip_leading_silence()
+        pending = self.recorder.get_samples_since(self._closed)
+        min_len = int(MIN_SEGMENT_SECONDS * self.sample_rate)
+        if len(pending) < min_len:
+            return
+
+        cut = find_silence_boundary(pending, self.sample_rate)
+        if (cut is None or cut < min_len) and len(pending) > MAX_SEGMENT_SECONDS * self.sample_rate:
+            cut = min_len + quietest_point(pending[min_len:], self.sample_rate)
+        if cut is None or cut < min_len:
+            return
+
+        cut -= cut % HOP
+        self._submit(pending[:cut], self._closed)
+        self._closed += cut
+
+    def finish(self, audio: np.ndarray) -> Future:
+        """Decode the open tail of *audio*; the future resolves to the stitched text.
+
+        Final jobs run in submission order, so by the time the stitch job runs
+        every segment before it has finished.
+        """
+        self._skip_leading_silence()
+        end = len(audio)
+        vad = getattr(self.recorder, "vad", None)
+        if clear_speech(vad):
+            end = max(self._closed, min(end, vad.speech_end + int(TRAILING_PAD_SECONDS * self.sample_rate)))
+            self.trimmed_seconds += (len(audio) - end) / self.sample_rate
+        tail = audio[self._closed:end]
+        if len(tail) > 0:
+            # Segments still queued or decoding run before the tail and eat into its budget
+            queued = sum(d for f, d in zip(self._results, self._durations) if not f.done())
+            self._submit(tail, self._closed, urgent=True, queued=queued)
+        results = self._results
+        self.reset()
+
+        def stitch():
+            texts = [f.result() for f in results if not f.cancelled()]
+            return " ".join(t for t in texts if t)
+
+        return self.scheduler.submit_final(stitch)
+
+    def cancel(self):
+        for f in self._results:
+            f.cancel()
+        self.reset()
+
+    def _skip_leading_silence(self):
+        """Start the first segment just before the first detected speech."""
+        vad = getattr(self.recorder, "vad", None)
+        if self._closed or self._results or not clear_speech(vad):
+            return
+        lead = vad.speech_start - int(SPEECH_PAD_SECONDS * self.sample_rate)
+        lead -= lead % HOP
+        if lead > 0:
+            self._closed = lead
+            self.trimmed_seconds += lead / self.sample_rate
+
+    def _submit(self, segment: np.ndarray, start: int, urgent: bool = False, queued: float = 0.0):
+        prev = self._results[-1] if self._results else None
+
+        def job():
+            done = prev is not None and prev.done() and not prev.cancelled() and not prev.exception()
+            prompt = prev.result()[-PROMPT_CHARS:] if done else ""
+            with metrics.stage("segment_decode"):
+                text = self.transcriber.transcribe(segment, prompt=prompt, start=start, urgent=urgent,
+                                                   queued=queued)
+            journal = getattr(self.recorder, "journal", None)
+            if journal is not None:
+                journal.append(start, start + len(segment), text)
+            if self.on_segment and text:
+                self.on_segment(text)
+            return text
+
+        self._results.append(self.scheduler.submit_final(job))
+        self._durations.append(len(segment) / self.sample_rate)
@@ -0,0 +1,88 @@
+"""Incremental streaming transcription — commit a stable prefix, decode only the tail.
+
+Each pass decodes the audio after the committed boundary. Words that two
+consecutive passes agree on (local agreement) are committed and the boundary
+moves to the end of the last committed word, so per-update cost depends on
+the length of the uncommitted tail rather than the whole recording.
+"""
+
+import numpy as np
+
+PROMPT_CHARS = 200  # committed text fed back to the decoder as context
+MAX_TAIL_SECONDS = 15.0  # force a commit when passes keep disagreeing this long
+HOP = 160  # commit boundaries snap to the mel hop so cached features line up
+KEEP_WORDS = 400  # committed words kept for the preview; older ones are trimmed
+
+
+def _norm(word: str) -> str:
+    return word.strip().lower().strip(".,!?;:\"'")
+
+
+class IncrementalStreamer:
+    def __init__(self, transcriber, sample_rate: int = 16000):
+        self.transcriber = transcriber
+        self.sample_rate = sample_rate
+        self.reset()
+
+    def reset(self):
+        self._committed: list[str] = []
+        self._offset = 0  # samples of recording covered by committed words
+        self._hypothesis: list[tuple[float, float, str]] = []  # absolute seconds
+
+    @property
+    def offset(self) -> int:
+        """Sample offset where the uncommitted tail starts."""
+        return self._offset
+
+    @property
+    def committed_text(self) -> str:
+        return "".join(self._committed).strip()
+
+    @property
+    def text(self) -> str:
+        """Committed prefix followed by the latest tentative words."""
+        return "".join(self._committed + [w for _, _, w in self._hypothesis]).strip()
+
+    def skip_to(self, offset: int):
+        """Move the boundary past leading silence; ignored once words are pending."""
+        if offset > self._offset and not self._hypothesis:
+            self._offset = offset - offset % HOP
+
+    def update(self, tail: np.ndarray) -> str:
+        """Decode *tail* (audio from `offset` onwards) and return the preview text."""
+        if len(tail) == 0:
+            return self.text
+
+        base = self._offset / self.sample_rate
+        words = [
+            (base + start, base + end, word)
+            for start, end, word in self.transcriber.transcribe_stream_words(
+                tail, prompt=self.committed_text[-PROMPT_CHARS:], start=self._offset,
+            )
+        ]
+        words = self._drop_repeated_prefix(words)
+
+        agreed = 0
+        for prev, new in zip(self._hypothesis, words):
+            if _norm(prev[2]) != _norm(new[2]):
+                break
+            agreed += 1
+        if agreed == 0 and len(tail) > MAX_TAIL_SECONDS * self.sample_rate:
+            agreed = max(len(words) - 1, 0)
+
+        if agreed:
+            self._committed.extend(w for _, _, w in words[:agreed])
+            if len(self._committed) > 2 * KEEP_WORDS:
+                del self._committed[:-KEEP_WORDS]  # keeps long-form updates flat
+            end = int(words[agreed - 1][1] * self.sample_rate)
+            self._offset = max(self._offset, end - end % HOP)
+        self._hypothesis = words[agreed:]
+        return self.text
+
+    def _drop_repeated_prefix(self, words):
+        """Strip words the decoder re-emitted from just before the boundary."""
+        committed = [_norm(w) for w in self._committed[-3:]]
+        for n in range(min(3, len(committed), len(words)), 0, -1):
+            if committed[-n:] == [_norm(w) for _, _, w in words[:n]]:
+                return words[n:]
+        return words
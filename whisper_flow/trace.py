@@ -0,0 +1,318 @@
+"""Session traces — record a dictation, replay it headless.
+
+    philoquent --trace                                  # or PHILOQUENT_TRACE=1
+    python -m whisper_flow replay TRACE.npz --speed 4 --stub
+    python -m whisper_flow replay TRACE.npz --model base -o run.json --compare before.json
+
+With tracing on, every dictation that gets as far as recording is written
+to traces/ in the data directory as one compressed .npz file. It holds the
+hotkey events, the audio blocks exactly as the recorder callback received
+them (16-bit, at the device rate, with their arrival times), every stage
+timing the metrics module sees, and the engine settings of the session.
+Audio past MAX_TRACE_SECONDS is not kept, so a long-form session cannot
+grow the trace without bound, and the file is compressed and written on
+a background thread rather than on the event loop.
+
+`replay` feeds a trace back through DictationEngine: the key events come
+from a scripted trigger, the audio is released block by block on its
+recorded schedule (through the same resampler), and both can run at
+--speed × real time. It prints recorded against replayed timings; with
+--compare it checks a previous replay result and fails on regressions
+beyond --tolerance.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .bundle_utils import get_data_dir
+from .metrics import metrics
+
+MAX_TRACES = 50  # oldest trace files are deleted beyond this many
+MAX_TRACE_SECONDS = 300.0  # audio captured after this far into a session is dropped from its trace
+KEY_EVENTS = ("press", "release", "interrupt")
+SUMMARY = ("first_stream_s", "stream_updates", "stream_decode_p50_s", "final_decode_s", "release_to_paste_s")
+
+
+def traces_dir() -> str:
+    path = os.path.join(get_data_dir(), "traces")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# ── Capture ───────────────────────────────────────────────────────────────
+
+class _Session:
+    def __init__(self, meta: dict):
+        self.t0 = time.monotonic()
+        self.meta = dict(meta)
+        self.events: list[tuple[float, str, dict]] = []
+        self.blocks: list[tuple[float, np.ndarray]] = []  # int16, as written to the file
+
+
+class SessionTracer:
+    """Collects one session at a time; a no-op until enable() is called."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = False
+        self.directory = None
+        self._session: _Session | None = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # one writer prunes the directory at a time
+        if enabled:
+            self.enable()
+
+    def enable(self, directory: str | None = None):
+        self.enabled = True
+        self.directory = directory
+        metrics.tap = self._stage
+
+    @property
+    def active(self) -> bool:
+        return self._session is not None
+
+    def begin(self, **meta):
+        if self.enabled:
+            self._session = _Session(meta)
+
+    def note(self, **meta):
+        session = self._session
+        if session:
+            session.meta.update(meta)
+
+    def event(self, kind: str, **fields):
+        session = self._session
+        if session:
+            with self._lock:
+                session.events.append((time.monotonic() - session.t0, kind, fields))
+
+    def audio(self, block: np.ndarray):
+        """Called from the audio callback with the block as captured."""
+        session = self._session
+        if session:
+            t = time.monotonic() - session.t0
+            if t > MAX_TRACE_SECONDS:
+                session.meta["audio_truncated_s"] = MAX_TRACE_SECONDS
+                return
+            session.blocks.append((t, (np.clip(block, -1.0, 1.0) * 32767).astype("int16")))
+
+    def discard(self):
+        self._session = None
+
+    def finish(self) -> str | None:
+        """Start writing the session to disk; returns its path, or None if nothing was recorded.
+
+        Compression runs on a writer thread, so the file appears at the path
+        shortly after this returns.
+        """
+        session, self._session = self._session, None
+        if session is None or not session.blocks:
+            return None
+        directory = self.directory or traces_dir()
+        path = os.path.join(directory, time.strftime("%Y%m%d-%H%M%S") + ".npz")
+        with self._lock:
+            events = list(session.events)
+        # Not a daemon thread: quitting right after a dictation still saves it
+        threading.Thread(target=self._write, args=(path, session, events), name="trace-writer").start()
+        return path
+
+    def _write(self, path: str, session: _Session, events: list):
+        tmp = path + ".tmp"
+        with self._write_lock:
+            with open(tmp, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    audio=np.concatenate([block for _, block in session.blocks]),
+                    block_sizes=np.array([len(block) for _, block in session.blocks], dtype="int32"),
+                    block_times=np.array([t for t, _ in session.blocks]),
+                    events=np.array(json.dumps(events)),
+                    meta=np.array(json.dumps(session.meta)),
+                )
+            os.replace(tmp, path)
+            _prune(os.path.dirname(path))
+
+    def _stage(self, name: str, seconds: float):
+        self.event("stage", name=name, seconds=seconds)
+
+
+def _prune(directory: str):
+    traces = sorted(f for f in os.listdir(directory) if f.endswith(".npz"))
+    for name in traces[:-MAX_TRACES]:
+        os.remove(os.path.join(directory, name))
+
+
+tracer = SessionTracer(enabled=os.environ.get("PHILOQUENT_TRACE") == "1")
+
+
+# ── Replay ────────────────────────────────────────────────────────────────
+
+def load_trace(path: str) -> dict:
+    with np.load(path) as data:
+        return {
+            "audio": data["audio"].astype("float32") / 32767,
+            "block_sizes": data["block_sizes"],
+            "block_times": data["block_times"],
+            "events": [tuple(e) for e in json.loads(str(data["events"]))],
+            "meta": json.loads(str(data["meta"])),
+        }
+
+
+def _event_time(trace: dict, kind: str) -> float | None:
+    return next((t for t, k, _ in trace["events"] if k == kind), None)
+
+
+def _summarize(events: list, record_start: float | None) -> dict:
+    """Summary timings from (time, kind, fields) events, recorded or replayed."""
+    stages: dict[str, list[float]] = {}
+    for _, kind, fields in events:
+        if kind == "stage":
+            stages.setdefault(fields["name"], []).append(fields["seconds"])
+    streams = [t for t, kind, _ in events if kind == "stream"]
+    final = stages.get("final_decode", [])
+    paste = stages.get("release_to_paste", [])
+    decode = stages.get("stream_decode", [])
+    return {
+        "first_stream_s": streams[0] - record_start if streams and record_start is not None else None,
+        "stream_updates": len(streams),
+        "stream_decode_p50_s": float(np.median(decode)) if decode else None,
+        "final_decode_s": final[-1] if final else None,
+        "release_to_paste_s": paste[-1] if paste else None,
+    }
+
+
+def replay(path: str, transcriber, speed: float = 1.0) -> dict:
+    """Drive DictationEngine from a trace file; return recorded and replayed summaries."""
+    from .engine import DictationEngine, MemoryDisplay, MemoryTextSink, ScheduledAudioSource, ScriptedTrigger
+    from .resample import StreamingResampler
+
+    trace = load_trace(path)
+    meta = trace["meta"]
+    sample_rate = meta.get("sample_rate", 16000)
+    record_start = _event_time(trace, "record_start")
+
+    # Convert block by block, as the recorder would, and note when each output sample arrived
+    device_rate = meta.get("device_rate", sample_rate)
+    resampler = StreamingResampler(device_rate, sample_rate) if device_rate != sample_rate else None
+    parts, ends, pos = [], [], 0
+    for size in trace["block_sizes"]:
+        block = trace["audio"][pos:pos + size]
+        pos += size
+        parts.append(resampler.process(block) if resampler else block)
+        ends.append((ends[-1] if ends else 0) + len(parts[-1]))
+    audio = np.concatenate(parts) if parts else np.zeros(0, dtype="float32")
+    source = ScheduledAudioSource(audio, trace["block_times"] - (record_start or 0.0), ends,
+                                  sample_rate=sample_rate, speed=speed)
+
+    script = [(t / speed, kind) for t, kind, _ in trace["events"] if kind in KEY_EVENTS]
+    events: list[tuple[float, str, dict]] = []
+    t0 = time.monotonic()
+
+    previous_tap = metrics.tap
+    metrics.tap = lambda name, seconds: events.append((time.monotonic() - t0, "stage",
+                                                       {"name": name, "seconds": seconds}))
+    try:
+        display, sink = MemoryDisplay(), MemoryTextSink()
+        engine = DictationEngine(
+            transcriber, source, display, sink, trigger=ScriptedTrigger(script),
+            hold_threshold=meta.get("hold_threshold", 0.3) / speed,
+            stream_initial_delay=meta.get("stream_initial_delay", 0.5) / speed,
+            stream_interval=meta.get("stream_interval", 0.7) / speed,
+            stream_duty_cycle=meta.get("stream_duty_cycle", 0.5),
+            result_linger=0,
+            incremental_insert=meta.get("incremental_insert", False),
+        )
+        engine.start(load=False)
+        time.sleep(script[-1][0] + 0.05 if script else 0.0)
+        engine.wait_idle()
+        engine.stop()
+    finally:
+        metrics.tap = previous_tap
+    events += [(t - t0, "stream", {}) for t, name, _ in display.events if name == "streaming"]
+
+    replayed_start = next((t - t0 for t, name, _ in display.events if name == "recording"), None)
+    recorded = _summarize(trace["events"], record_start)
+    replayed = _summarize(events, replayed_start)
+    if replayed["first_stream_s"] is not None:
+        replayed["first_stream_s"] *= speed  # on the trace's clock
+    return {
+        "trace": os.path.basename(path),
+        "duration_s": round(len(audio) / sample_rate, 2),
+        "speed": speed,
+        "recorded": recorded,
+        "replayed": replayed,
+        "recorded_text": next((f.get("text") for _, kind, f in trace["events"] if kind == "final"), None),
+        "replayed_text": sink.text,
+    }
+
+
+def _fmt(value) -> str:
+    return "-" if value is None else f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m whisper_flow replay",
+                                     description="Replay recorded dictation traces through the pipeline")
+    parser.add_argument("traces", nargs="+", help="Trace files (.npz) from the traces/ data directory")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed relative to real time (default: 1)")
+    parser.add_argument("--model", help="Model size for the final pass (default: the one the trace used)")
+    parser.add_argument("--stub", action="store_true", help="Use the bench's fixed-cost stub model")
+    parser.add_argument("-o", "--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Previous replay results to check against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown against --compare before failing (default: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    from .transcriber import Transcriber
+
+    results = []
+    for path in args.traces:
+        meta = load_trace(path)["meta"]
+        kwargs = {}
+        if args.stub:
+            from .bench import StubModel
+            kwargs["model_factory"] = StubModel
+        transcriber = Transcriber(model_size=args.model or meta.get("model", "base"),
+                                  language=meta.get("language", "en"), load=False, idle_unload=None,
+                                  **kwargs)
+        transcriber.load()
+        if transcriber.load_error:
+            print(f"Model failed to load: {transcriber.load_error}", file=sys.stderr)
+            return 1
+        result = replay(path, transcriber, speed=args.speed)
+        results.append(result)
+        print(f"── {result['trace']} ({result['duration_s']}s at {args.speed:g}×)")
+        print(f"{'':<22}{'recorded':>10}{'replayed':>10}")
+        for key in SUMMARY:
+            print(f"{key:<22}{_fmt(result['recorded'][key]):>10}{_fmt(result['replayed'][key]):>10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+        print(f"Wrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {r["trace"]: r for r in json.load(f)["results"]}
+        failed = False
+        for result in results:
+            prev = baseline.get(result["trace"])
+            if not prev:
+                continue
+            if prev["speed"] != result["speed"]:
+                print(f"{result['trace']}: baseline ran at {prev['speed']:g}×, not comparable", file=sys.stderr)
+                continue
+            for key in SUMMARY:
+                old, new = prev["replayed"].get(key), result["replayed"][key]
+                if key == "stream_updates" or not old or new is None:
+                    continue
+                change = (new - old) / old
+                flag = "REGRESSION" if change > args.tolerance else ""
+                failed |= bool(flag)
+                print(f"{result['trace']} {key}: {change * 100:+.0f}% {flag}")
+        return 1 if failed else 0
+    return 0
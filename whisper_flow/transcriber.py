@@ -1,52 +1,472 @@
 """Local Whisper transcription — tiny model for streaming, selected model for final."""
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 from faster_whisper import WhisperModel
 
 from .bundle_utils import get_model_cache_dir
+from .features import CachedFeatureExtractor
+from .language import LanguagePrior, SessionLanguage
+from .metrics import metrics
+from .residency import ModelResidency
+from .vad import split_at_silence
+
+WARMUP_SECONDS = 1.0  # synthetic audio decoded once after load to pay lazy init up front
+STORE_BUILD_IDLE_SECONDS = 60.0  # models unused this long before a missing store variant is converted
+IDLE_UNLOAD_SECONDS = 600.0  # final model is dropped after this long unused
+BATCH_MAX_SECONDS = 30.0  # clips up to one Whisper window can share a batched decode
+CHUNK_SECONDS = 28.0  # final clips longer than this are split at pauses into chunks up to this long
+MIN_CHUNK_SECONDS = 10.0  # a chunk with no pause is cut on its quietest frame after this
+FINAL_BATCH_SIZE = 1  # chunks per batched pass over a long final clip; 1 (default) decodes it in one call
+BATCH_MAX_PIECES = 8  # speech pieces per batched pass in transcribe_batch
+NO_SPEECH_THRESHOLD = 0.6
+
+# Decode options per named profile; beam_size is filled in from the Transcriber
+DECODE_PROFILES = {
+    "greedy": {"beam_size": 1, "best_of": 1, "temperature": 0.0},
+    "no-fallback": {"temperature": 0.0},  # beam search without the temperature retry ladder
+    "beam": {"temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)},  # library default
+}
+STREAM_PROFILE = "greedy"
+FINAL_PROFILE = "beam"
+BEAM_SIZE = 5
+# Rough CPU real-time factors (beam search) until a decode has been measured
+NOMINAL_RTF = {"tiny": 0.03, "base": 0.06, "small": 0.18, "medium": 0.5, "large-v3": 1.0}
+GREEDY_SPEEDUP = 2.0  # assumed beam/greedy cost ratio until greedy has been measured
+RTF_ALPHA = 0.3  # weight of the newest decode in the real-time factor average
 
 
 class Transcriber:
-    def __init__(self, model_size: str = "base", language: str = "en"):
-        self.language = language
-        cache_dir = get_model_cache_dir()
-
-        if model_size == "tiny":
-            print("Loading model (tiny)... ", end="", flush=True)
-            self.final_model = WhisperModel(
-                "tiny", device="cpu", compute_type="auto",
-                download_root=cache_dir,
-            )
-            self.stream_model = self.final_model
-            print("done.")
+    def __init__(self, model_size: str = "base", language: str = "en", load: bool = True,
+                 idle_unload: float | None = IDLE_UNLOAD_SECONDS, memory_budget_mb: float | None = None,
+                 cpu_threads: int = 0, num_workers: int = 1, compute_type: str = "auto",
+                 calibration: dict | None = None, stream_profile: str = STREAM_PROFILE,
+                 final_profile: str = FINAL_PROFILE, beam_size: int = BEAM_SIZE,
+                 latency_budget_ms: float | None = None, chunk_seconds: float = CHUNK_SECONDS,
+                 final_batch_size: int = FINAL_BATCH_SIZE, model_store=None, model_factory=WhisperModel):
+        if not 0 < chunk_seconds <= BATCH_MAX_SECONDS:
+            # pad_or_trim would silently drop whatever a chunk holds past one window
+            raise ValueError(f"chunk_seconds must be in (0, {BATCH_MAX_SECONDS:g}], got {chunk_seconds:g}")
+        self.model_size = model_size
+        self.language = language  # "auto" detects it once per dictation (see language.py)
+        self.auto_language = language == "auto"
+        self.language_prior = LanguagePrior() if self.auto_language else None
+        self.session_language: SessionLanguage | None = None  # set by begin_session()
+        self.cpu_threads = cpu_threads  # 0 lets CTranslate2 pick
+        self.num_workers = num_workers
+        self.compute_type = compute_type
+        self.calibration = calibration or {}  # per-size overrides from calibration.load_profile()
+        self.stream_profile = stream_profile
+        self.final_profile = final_profile
+        self.beam_size = beam_size
+        # Cap on the release-critical final decode; may step down the profile or model
+        self.latency_budget_ms = latency_budget_ms
+        # Long final clips: chunk length and chunks per batched pass (see transcribe_chunked)
+        self.chunk_seconds = chunk_seconds
+        self.final_batch_size = final_batch_size
+        self.workers: dict[str, int] = {}  # CTranslate2 workers each model was loaded with
+        self.rtf: dict[tuple[str, str], float] = {}  # (size, profile) -> measured real-time factor
+        self.model_store = model_store  # modelstore.ModelStore with pre-converted variants, if any
+        self._model_factory = model_factory  # swapped for a stub in benchmarks
+        self.stream_ready = threading.Event()
+        self.final_ready = threading.Event()
+        self.load_error: Exception | None = None
+        self.timings: dict[str, float] = {}
+        self.features = None  # MelFeatureCache for the current recording, set by DictationEngine
+
+        # Models are keyed by size, so with model_size="tiny" both roles share one
+        self._keys = {"stream": "tiny", "final": model_size}
+        self.models = ModelResidency(budget_mb=memory_budget_mb, idle_seconds=idle_unload)
+        self.models.register("tiny", self._loader("tiny"), pinned=True)
+        self.models.register(model_size, self._loader(model_size))
+        if load:
+            self.load()
+
+    @property
+    def stream_model(self) -> WhisperModel | None:
+        return self.models.peek(self._keys["stream"])
+
+    @property
+    def final_model(self) -> WhisperModel | None:
+        return self.models.peek(self._keys["final"])
+
+    @property
+    def ready(self) -> bool:
+        return self.stream_ready.is_set() and self.final_ready.is_set()
+
+    def load(self, stream: bool = True):
+        """Load and warm up both models in parallel. Blocks until both are done.
+
+        With stream=False only the final model is loaded, for headless use.
+        """
+        t0 = time.monotonic()
+        if self.model_size == "tiny":
+            jobs = [("tiny", ("stream", "final"))]
+        elif stream:
+            jobs = [("tiny", ("stream",)), (self.model_size, ("final",))]
         else:
-            print("Loading streaming model (tiny)... ", end="", flush=True)
-            self.stream_model = WhisperModel(
-                "tiny", device="cpu", compute_type="auto",
-                download_root=cache_dir,
-            )
-            print("done.")
-            print(f"Loading final model ({model_size})... ", end="", flush=True)
-            self.final_model = WhisperModel(
-                model_size, device="cpu", compute_type="auto",
-                download_root=cache_dir,
-            )
-            print("done.")
+            jobs = [(self.model_size, ("final",))]
+        threads = [
+            threading.Thread(target=self._initial_load, args=job, daemon=True)
+            for job in jobs
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.timings["total"] = time.monotonic() - t0
+        print(f"Models ready in {self.timings['total']:.1f}s.", flush=True)
+
+    def prefetch_final(self):
+        """Reload the final model ahead of use if it was unloaded while idle."""
+        if self.final_ready.is_set() and not self.load_error:
+            self.models.prefetch(self._keys["final"])
+
+    def _loader(self, size: str):
+        def load() -> WhisperModel:
+            t0 = time.monotonic()
+            settings = {"compute_type": self.compute_type, "cpu_threads": self.cpu_threads,
+                        "num_workers": self.num_workers}
+            calibrated = self.calibration.get(size, {})
+            settings.update({k: calibrated[k] for k in settings if k in calibrated})
+            self.workers[size] = settings["num_workers"]
+            store, source = self.model_store, "Hub cache"
+            path = None
+            if store:
+                path, concrete = store.resolve(size, settings["compute_type"])
+            if path:
+                try:
+                    model = self._model_factory(path, device="cpu", **{**settings, "compute_type": concrete})
+                    source = "store"
+                except Exception as e:
+                    print(f"Stored {size} model failed to load ({e}); using the Hub cache.", flush=True)
+                    store.remove(size, concrete)
+                    path = None
+            if not path:
+                model = self._model_factory(
+                    size, device="cpu", download_root=get_model_cache_dir(), **settings,
+                )
+            if hasattr(model, "feature_extractor"):
+                model.feature_extractor = CachedFeatureExtractor(model.feature_extractor)
+            t1 = time.monotonic()
+            warmup = np.zeros(int(WARMUP_SECONDS * 16000), dtype="float32")
+            # A fixed language: detection here would wait on this very load, and zeros must
+            # never settle a dictation's language or enter the prior
+            language = "en" if self.auto_language else self.language
+            list(model.transcribe(warmup, language=language, beam_size=1)[0])
+            t2 = time.monotonic()
+            print(f"Loaded {size} model from {source} in {t1 - t0:.1f}s (warm-up {t2 - t1:.2f}s).", flush=True)
+            self.timings[f"{size}_load"] = t1 - t0
+            self.timings[f"{size}_warmup"] = t2 - t1
+            if path:
+                store.verify_later(size, concrete)
+            elif store:
+                # Convert once nothing is being transcribed, so the next launch loads the stored variant
+                store.prefetch([(size, settings["compute_type"])], warm=False, wait=self._until_idle)
+            return model
+        return load
+
+    def _until_idle(self):
+        """Block until no model has been used for STORE_BUILD_IDLE_SECONDS."""
+        while (left := STORE_BUILD_IDLE_SECONDS - self.models.idle_for()) > 0:
+            time.sleep(left)
+
+    def begin_session(self):
+        """A dictation starts; with language="auto" its language is detected afresh."""
+        if self.auto_language:
+            self.session_language = SessionLanguage(self.language_prior)
+
+    def _language_for(self, audio: np.ndarray, final: bool = False) -> str | None:
+        """Language to decode *audio* with, detecting the session's language once there is enough speech.
+
+        None lets faster-whisper detect it per decode, which is what happens
+        in auto mode outside a dictation (batch, daemon).
+        """
+        if not self.auto_language:
+            return self.language
+        session = self.session_language
+        if session is None:
+            return None
+        seconds = len(audio) / 16000
+        if session.wants(seconds, final):
+            self._detect_language(session, audio, seconds, final)
+        return session.guess
+
+    def _detect_language(self, session: SessionLanguage, audio: np.ndarray, seconds: float, final: bool):
+        model = self._wait_for("stream")
+        if not model.model.is_multilingual:
+            session.settle("en")
+            return
+        try:
+            with metrics.stage("language_detect"):
+                _, _, probabilities = model.detect_language(audio, vad_filter=True)
+        except Exception as e:  # e.g. no speech found yet
+            if final:
+                print(f"Language detection failed ({e}); using {session.guess or 'per-decode detection'}.",
+                      flush=True)
+            return
+        if session.observe(probabilities, seconds, final):
+            print(f"Language: {session.language} ({session.probability:.0%} after {seconds:.1f}s)", flush=True)
+
+    def _initial_load(self, size: str, roles: tuple[str, ...]):
+        try:
+            self.models.get(size, prefetch=True)
+        except Exception as e:
+            print(f"Failed to load {size} model: {e}", flush=True)
+            self.load_error = e
+        finally:
+            for role in roles:
+                getattr(self, f"{role}_ready").set()
+
+    def _wait_for(self, role: str) -> WhisperModel:
+        getattr(self, f"{role}_ready").wait()
+        if self.load_error:
+            raise RuntimeError(f"{role} model failed to load: {self.load_error}")
+        return self.models.get(self._keys[role])
+
+    def decode_options(self, profile: str) -> dict:
+        options = {"beam_size": self.beam_size}
+        options.update(DECODE_PROFILES[profile])
+        return options
+
+    def estimate_rtf(self, size: str, profile: str) -> float:
+        """Measured real-time factor for a model/profile pair, or a prior guess."""
+        if (size, profile) in self.rtf:
+            return self.rtf[(size, profile)]
+        rtf = self.calibration.get(size, {}).get("rtf") or NOMINAL_RTF.get(size, 1.0)
+        return rtf / GREEDY_SPEEDUP if profile == "greedy" else rtf
+
+    def choose_final(self, duration: float, queued: float = 0.0) -> tuple[str, str]:
+        """(role, profile) expected to decode *duration* seconds within the latency budget.
+
+        Tries the final model with its profile, then greedily, then the
+        resident tiny model greedily, which is also the fallback when nothing
+        fits. A final model that is not loaded is charged its last load time.
+        *queued* seconds of segments still ahead of this decode on the final
+        queue are charged at the final model's own speed, since they run first.
+        """
+        if not self.latency_budget_ms:
+            return "final", self.final_profile
+        budget = self.latency_budget_ms / 1000
+        size = self._keys["final"]
+        load = 0.0 if self.models.is_resident(size) else self.timings.get(f"{size}_load", budget)
+        # Queued segments run first and on the final model, whatever the tail ends up using
+        ahead = queued * self.estimate_rtf(size, self.final_profile) + (load if queued else 0.0)
+        for role, profile in (("final", self.final_profile), ("final", "greedy"), ("stream", "greedy")):
+            cost = duration * self.estimate_rtf(self._keys[role], profile)
+            if role == "final" and not queued:
+                cost += load
+            if ahead + cost <= budget:
+                return role, profile
+        return "stream", "greedy"
+
+    def _decode(self, role: str, audio: np.ndarray, start: int | None, profile: str, **kwargs) -> list:
+        """Run the role's model on *audio*; *start* is its offset in the current recording.
+
+        With an offset and a feature cache, log-mel frames come from the cache
+        instead of being recomputed. Silero VAD would rewrite the audio before
+        feature extraction, so it is skipped on that path. Decode time feeds
+        the real-time factor estimate for the model/profile pair.
+        """
+        language = self._language_for(audio)
+        model = self._wait_for(role)
+        kwargs.update(self.decode_options(profile))
+        extractor = getattr(model, "feature_extractor", None)
+        t0 = time.monotonic()
+        if start is None or self.features is None or not isinstance(extractor, CachedFeatureExtractor):
+            segments, _ = model.transcribe(audio, language=language, vad_filter=True, **kwargs)
+            segments = list(segments)
+        else:
+            with extractor.precomputed(audio, self.features, start):
+                segments, _ = model.transcribe(audio, language=language, vad_filter=False, **kwargs)
+                segments = list(segments)
+        rtf = (time.monotonic() - t0) / (len(audio) / 16000)
+        key = (self._keys[role], profile)
+        prev = self.rtf.get(key)
+        self.rtf[key] = rtf if prev is None else prev + RTF_ALPHA * (rtf - prev)
+        return segments
 
     def transcribe_stream(self, audio: np.ndarray) -> str:
         """Fast streaming transcription using tiny model."""
         if len(audio) == 0:
             return ""
-        segments, _ = self.stream_model.transcribe(
-            audio, language=self.language, vad_filter=True,
-        )
+        segments = self._decode("stream", audio, None, self.stream_profile)
         return " ".join(seg.text for seg in segments).strip()
 
-    def transcribe(self, audio: np.ndarray) -> str:
-        """Accurate final transcription using selected model."""
+    def transcribe_stream_words(self, audio: np.ndarray, prompt: str = "",
+                                start: int | None = None) -> list[tuple[float, float, str]]:
+        """Streaming pass with word timings, conditioned on already-committed text."""
         if len(audio) == 0:
-            return ""
-        segments, _ = self.final_model.transcribe(
-            audio, language=self.language, vad_filter=True,
+            return []
+        segments = self._decode(
+            "stream", audio, start, self.stream_profile,
+            word_timestamps=True, initial_prompt=prompt or None,
+            condition_on_previous_text=False,
         )
+        return [(w.start, w.end, w.word) for seg in segments for w in (seg.words or [])]
+
+    def transcribe(self, audio: np.ndarray, prompt: str = "", start: int | None = None,
+                   urgent: bool = False, queued: float = 0.0) -> str:
+        """Accurate final transcription using selected model.
+
+        *urgent* marks the decode the user is waiting on; it is held to the
+        latency budget, if one is set, after the *queued* seconds of segments
+        that will be decoded before it.
+        """
+        if len(audio) == 0:
+            return ""
+        self._language_for(audio, final=True)  # short dictations settle their language here
+        role, profile = "final", self.final_profile
+        if urgent:
+            role, profile = self.choose_final(len(audio) / 16000, queued)
+            if (role, profile) != ("final", self.final_profile):
+                print(f"Latency budget: {len(audio) / 16000:.1f}s tail decoded with "
+                      f"{self._keys[role]}/{profile}", flush=True)
+        # Dictation segments (with a start offset) are already cut at pauses and use cached features
+        if start is None and self.final_batch_size > 1 and len(audio) > self.chunk_seconds * 16000:
+            return self.transcribe_chunked(audio, prompt=prompt, role=role, profile=profile)
+        segments = self._decode(role, audio, start, profile, initial_prompt=prompt or None)
         return " ".join(seg.text for seg in segments).strip()
+
+    def chunk_bounds(self, audio: np.ndarray) -> list[tuple[int, int]]:
+        """Where transcribe_chunked cuts *audio*, as (start, end) sample offsets."""
+        return split_at_silence(audio, 16000, self.chunk_seconds, min(MIN_CHUNK_SECONDS, self.chunk_seconds))
+
+    def transcribe_chunked(self, audio: np.ndarray, prompt: str = "", role: str = "final",
+                           profile: str | None = None) -> str:
+        """Decode a long clip as chunks cut at pauses, several per batched pass.
+
+        Chunks are at most chunk_seconds long so each fits one Whisper
+        window. Groups of final_batch_size run as one batched encode and
+        beam search, and groups run side by side on the model's CTranslate2
+        workers. Chunks are decoded without timestamps, temperature
+        fallback or the previous chunk's text as context; only the first
+        gets *prompt*, and is then decoded on its own. Texts are joined in order. Chunks in which Silero VAD
+        finds no speech are dropped, as the sequential decode's vad_filter
+        would drop that audio.
+        """
+        from faster_whisper.vad import get_speech_timestamps
+
+        profile = profile or self.final_profile
+        model = self._wait_for(role)
+        speech = get_speech_timestamps(audio)
+        chunks = [audio[a:b] for a, b in self.chunk_bounds(audio)
+                  if any(s["start"] < b and s["end"] > a for s in speech)]
+        if not chunks:
+            return ""
+        prompts = [prompt] + [""] * (len(chunks) - 1)
+        language = self._language_for(audio)
+        if language is None and model.model.is_multilingual:
+            language = model.detect_language(audio, vad_filter=True)[0]  # once for the whole clip
+        beam_size = self.decode_options(profile)["beam_size"]
+        size = self.final_batch_size
+        # A prompted first chunk could not share a generate call with unprompted ones anyway
+        first = 1 if prompt else 0
+        groups = [range(0, first)] if first else []
+        groups += [range(i, min(i + size, len(chunks))) for i in range(first, len(chunks), size)]
+
+        def decode(group):
+            return self._generate_batch(model, [chunks[i] for i in group], [prompts[i] for i in group],
+                                        beam_size=beam_size, language=language)
+
+        workers = min(len(groups), self.workers.get(self._keys[role], 1))
+        if workers > 1:
+            with ThreadPoolExecutor(workers) as pool:
+                texts = [t for group in pool.map(decode, groups) for t in group]
+        else:
+            texts = [t for group in groups for t in decode(group)]
+        return " ".join(t for t in texts if t)
+
+    def transcribe_batch(self, audios: list[np.ndarray], prompts: list[str] | None = None,
+                         stream: bool = False) -> list[str]:
+        """Decode several clips, batching them into shared encoder/decoder passes.
+
+        Every final clip gets the same decode however many arrive together,
+        so its text does not depend on what else shared the batch: Silero VAD
+        keeps only its speech (as vad_filter does for a sequential decode),
+        the speech is packed into pieces of at most chunk_seconds, and all
+        pieces run through batched beam search at the final profile's beam
+        width, without timestamps or temperature fallback. Only a clip's
+        first piece gets its prompt. Stream clips are decoded one by one.
+        """
+        prompts = prompts or [""] * len(audios)
+        if stream:
+            return [self.transcribe_stream(a) for a in audios]
+        from faster_whisper.vad import VadOptions, collect_chunks, get_speech_timestamps
+
+        vad_options = VadOptions(max_speech_duration_s=self.chunk_seconds)
+        pieces, owners, piece_prompts = [], [], []
+        for i, (audio, prompt) in enumerate(zip(audios, prompts)):
+            speech = get_speech_timestamps(audio, vad_options) if len(audio) else []
+            chunks, _ = collect_chunks(audio, speech, max_duration=self.chunk_seconds)
+            for chunk in chunks:
+                if len(chunk):
+                    pieces.append(chunk)
+                    owners.append(i)
+                    piece_prompts.append(prompt)
+                    prompt = ""
+        if not pieces:
+            return ["" for _ in audios]
+        texts = [[] for _ in audios]
+        model = self._wait_for("final")
+        beam_size = self.decode_options(self.final_profile)["beam_size"]
+        for g in range(0, len(pieces), BATCH_MAX_PIECES):
+            decoded = self._generate_batch(model, pieces[g:g + BATCH_MAX_PIECES],
+                                           piece_prompts[g:g + BATCH_MAX_PIECES], beam_size=beam_size)
+            for owner, text in zip(owners[g:g + BATCH_MAX_PIECES], decoded):
+                if text:
+                    texts[owner].append(text)
+        return [" ".join(t) for t in texts]
+
+    def _generate_batch(self, model: WhisperModel, audios: list[np.ndarray], prompts: list[str],
+                        beam_size: int, language: str | None = None) -> list[str]:
+        """Batched encoder/decoder passes over clips of up to one window each.
+
+        Clips whose prompts tokenize to the same length share one pass.
+        """
+        from faster_whisper.audio import pad_or_trim
+        from faster_whisper.tokenizer import Tokenizer
+        from faster_whisper.transcribe import get_suppressed_tokens
+
+        features = np.stack([
+            pad_or_trim(model.feature_extractor(a)[..., :-1]) for a in audios
+        ])
+        # Without a language, clips are taken as unrelated (daemon clients) and each is detected
+        if language is None and not self.auto_language:
+            language = self.language
+        if language is None and not model.model.is_multilingual:
+            language = "en"
+        languages = [language or model.detect_language(features=f)[0] for f in features]
+        tokenizers = {
+            lang: Tokenizer(model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language=lang)
+            for lang in set(languages)
+        }
+        batch_prompts = [
+            model.get_prompt(
+                tokenizers[lang],
+                previous_tokens=tokenizers[lang].encode(" " + p.strip()) if p else [],
+                without_timestamps=True,
+            )
+            for lang, p in zip(languages, prompts)
+        ]
+        tokenizer = tokenizers[languages[0]]
+        # CTranslate2 needs <|startoftranscript|> at the same position in every item of one
+        # generate call, so items whose prompts differ in token length go in separate calls
+        groups: dict[int, list[int]] = {}
+        for i, tokens in enumerate(batch_prompts):
+            groups.setdefault(len(tokens), []).append(i)
+        texts = [""] * len(audios)
+        for group in groups.values():
+            results = model.model.generate(
+                model.encode(features[group]), [batch_prompts[i] for i in group],
+                beam_size=beam_size, max_length=model.max_length,
+                suppress_blank=True, suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+                return_no_speech_prob=True,
+            )
+            for i, r in zip(group, results):
+                if r.no_speech_prob <= NO_SPEECH_THRESHOLD:
+                    texts[i] = tokenizer.decode(r.sequences_ids[0]).strip()
+        return texts
@@ -0,0 +1,131 @@
+"""Cheap energy-based silence detection for cutting speech into segments.
+
+The functions work on a finished clip; VoiceActivityTracker does the same
+job online, fed block by block from the audio callback.
+"""
+
+import numpy as np
+
+FRAME_SECONDS = 0.03
+MIN_SILENCE_SECONDS = 0.6  # pause long enough to close a segment
+ABS_THRESHOLD = 0.01  # RMS below this is always silence
+NOISE_FACTOR = 2.5  # speech must be this much louder than the noise floor
+FLOOR_ADAPT = 0.05  # per-frame pull of the noise floor towards a quiet frame
+FLOOR_ADAPT_SPEECH = 0.0005  # ...and towards a speech frame, so steady noise is learned
+
+
+def frame_rms(audio: np.ndarray, frame: int) -> np.ndarray:
+    """RMS per non-overlapping frame (trailing partial frame dropped)."""
+    n = len(audio) // frame
+    if n == 0:
+        return np.zeros(0, dtype="float32")
+    frames = np.asarray(audio[: n * frame], dtype="float32").reshape(n, frame)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def speech_mask(rms: np.ndarray) -> np.ndarray:
+    if len(rms) == 0:
+        return np.zeros(0, dtype=bool)
+    floor = float(np.percentile(rms, 10))
+    return rms > max(ABS_THRESHOLD, NOISE_FACTOR * floor)
+
+
+def find_silence_boundary(audio: np.ndarray, sample_rate: int,
+                          min_silence: float = MIN_SILENCE_SECONDS) -> int | None:
+    """Sample offset in the middle of the last pause that follows speech.
+
+    Returns None when *audio* has no speech followed by at least
+    *min_silence* seconds of silence.
+    """
+    frame = int(FRAME_SECONDS * sample_rate)
+    speech = speech_mask(frame_rms(audio, frame))
+    need = max(1, int(min_silence / FRAME_SECONDS))
+
+    run = 0
+    best = None
+    seen_speech = False
+    for i, is_speech in enumerate(speech):
+        if is_speech:
+            if seen_speech and run >= need:
+                best = i - run // 2
+            seen_speech = True
+            run = 0
+        else:
+            run += 1
+    if seen_speech and run >= need:
+        best = len(speech) - run // 2
+    return None if best is None else best * frame
+
+
+def quietest_point(audio: np.ndarray, sample_rate: int) -> int:
+    """Sample offset of the lowest-energy frame, for forced cuts in long speech."""
+    frame = int(FRAME_SECONDS * sample_rate)
+    rms = frame_rms(audio, frame)
+    if len(rms) == 0:
+        return len(audio)
+    return int(np.argmin(rms)) * frame + frame // 2
+
+
+def split_at_silence(audio: np.ndarray, sample_rate: int, max_seconds: float,
+                     min_seconds: float) -> list[tuple[int, int]]:
+    """(start, end) offsets of consecutive chunks of at most *max_seconds*.
+
+    Each cut falls in the last pause of the remaining audio's next
+    *max_seconds*; without one at least *min_seconds* in, it falls on the
+    quietest frame after that.
+    """
+    max_len, min_len = int(max_seconds * sample_rate), int(min_seconds * sample_rate)
+    bounds, start = [], 0
+    while len(audio) - start > max_len:
+        window = audio[start:start + max_len]
+        cut = find_silence_boundary(window, sample_rate)
+        if cut is None or cut < min_len:
+            cut = min_len + quietest_point(window[min_len:], sample_rate)
+        bounds.append((start, start + cut))
+        start += cut
+    bounds.append((start, len(audio)))
+    return bounds
+
+
+class VoiceActivityTracker:
+    """Online speech detector fed from the audio callback.
+
+    Keeps a running noise floor (drops instantly, rises slowly) and publishes
+    where speech first started and last ended as sample offsets. Only the
+    callback thread writes, and every field is a plain int, so readers never
+    lock.
+    """
+
+    def __init__(self, sample_rate: int = 16000):
+        self.frame = int(FRAME_SECONDS * sample_rate)
+        self.reset()
+
+    def reset(self):
+        self.samples = 0  # samples fed so far
+        self.speech_start: int | None = None
+        self.speech_end = 0  # end of the last speech frame
+        self.speech_frames = 0
+        self._floor: float | None = None
+        self._carry = np.zeros(0, dtype="float32")
+
+    def feed(self, block: np.ndarray):
+        base = self.samples - len(self._carry)  # offset of the first carried sample
+        self.samples += len(block)
+        if len(self._carry):
+            block = np.concatenate((self._carry, block))
+        n = len(block) // self.frame
+        self._carry = np.array(block[n * self.frame:], dtype="float32")
+
+        floor = self._floor
+        for i, level in enumerate(frame_rms(block, self.frame).tolist()):
+            if floor is None or level < floor:
+                floor = level
+            speech = level > max(ABS_THRESHOLD, NOISE_FACTOR * floor)
+            floor += (FLOOR_ADAPT_SPEECH if speech else FLOOR_ADAPT) * (level - floor)
+            if speech:
+                offset = base + i * self.frame
+                if self.speech_start is None:
+                    self.speech_start = offset
+                self.speech_end = offset + self.frame
+                self.speech_frames += 1
+        self._floor = floor